@@ -1,8 +1,40 @@
+import argparse
 import json
+import sys
 from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).with_name("dist")))
+
+from offset_index import OffsetIndex
+
+
+def count_from_index() -> Optional[int]:
+    """Titled count of the scraper's project list, precomputed in the offset index."""
+    index = OffsetIndex.open(Path(__file__).with_name("dist"))
+    if index is None:
+        return None
+    with index:
+        return index.counts.titled
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Count projects with a title.")
+    # The index covers the scraper's list, not projects_with_presentation_links.json
+    parser.add_argument(
+        "--scraper-list",
+        action="store_true",
+        help="count the scraper's project list from dist/projects_index.bin instead",
+    )
+    args = parser.parse_args()
+
+    if args.scraper_list:
+        count = count_from_index()
+        if count is None:
+            sys.exit("No usable offset index in dist/; run the scraper first.")
+        print(count)
+        return
+
     data_path = Path(__file__).with_name("projects_with_presentation_links.json")
     data = json.loads(data_path.read_text(encoding="utf-8"))
 
@@ -1,10 +1,22 @@
+import contextlib
+import fcntl
+import hashlib
 import json
 import os
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from project_store import ProjectStore, list_key
+from run_metrics import RunMetrics
 
 
 LIST_URL = "https://my.remapp.ae/api/project/public/list"
@@ -14,14 +26,26 @@ ROOT_DIR = Path(__file__).resolve().parent.parent
 OUTPUT_DIR = Path(__file__).resolve().parent
 ENV_PATH = ROOT_DIR / ".env"
 DETAIL_SLEEP_SECONDS = 0.5
+DETAIL_MIN_RATE = 0.2
+DETAIL_MAX_RATE = 8.0
+DETAIL_RATE_STEP = 0.25
 MAX_RETRIES = 5
 RETRY_BACKOFF_SECONDS = 5
 DETAILS_JSONL_PATH = OUTPUT_DIR / "projects_details.jsonl"
 LOG_EVERY = 50
+LIST_WORKERS = 4
+INCREMENTAL_PAGE_LIMIT = 10
+FULL_SYNC_HOURS = 24.0
 LIST_CACHE_PATH = OUTPUT_DIR / "projects_from_api.json"
 DETAILS_ERROR_PATH = OUTPUT_DIR / "projects_details_errors.jsonl"
+PROJECT_STORE_PATH = OUTPUT_DIR / "projects.sqlite3"
+CHANGES_JSONL_PATH = OUTPUT_DIR / "projects_changes.jsonl"
+DELTA_PATH = OUTPUT_DIR / "projects_delta.json"
+METRICS_JSON_PATH = OUTPUT_DIR / "run_metrics.json"
+METRICS_PROM_PATH = OUTPUT_DIR / "run_metrics.prom"
+RUN_LOCK_PATH = OUTPUT_DIR / ".scraper.lock"
+METRICS_INTERVAL_SECONDS = 15.0
 INCREMENTAL_STATE_PATH = OUTPUT_DIR / "incremental_state.json"
-DETAIL_BATCH_STATE_PATH = OUTPUT_DIR / "detail_batch_state.json"
 
 
 def load_env_file(path: Path) -> None:
@@ -56,6 +80,7 @@ def save_env_value(path: Path, key: str, value: str) -> None:
 def build_headers(token: Optional[str]) -> Dict[str, str]:
     headers = {
         "Accept": "application/json",
+        "Accept-Encoding": "gzip, deflate",
         "Content-Type": "application/json",
         "Origin": "https://offplan.remapp.ae",
         "Referer": "https://offplan.remapp.ae/",
@@ -66,13 +91,186 @@ def build_headers(token: Optional[str]) -> Dict[str, str]:
     return headers
 
 
-def fetch_page(page: int, token: Optional[str]) -> Dict[str, Any]:
-    payload = {"page": page}
-    response = requests.post(
-        LIST_URL, headers=build_headers(token), json=payload, timeout=30
-    )
-    response.raise_for_status()
-    return response.json()
+LOGIN_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+    "Content-Type": "application/json",
+    "Device": "2",
+    "Origin": "https://v3.remapp.ae",
+    "Referer": "https://v3.remapp.ae/",
+    "User-Agent": "Mozilla/5.0",
+}
+AUTH_REQUIRED_MESSAGE = (
+    "API requires auth. Set REMAPP_BEARER_TOKEN or login creds in remapp_scraper/.env"
+)
+
+
+class TokenManager:
+    """Holds the bearer token and refreshes it at most once per expiry.
+
+    When many in-flight requests hit 401 together, the first caller logs in and
+    writes ``.env``; the others find the token already replaced and reuse it.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str],
+        username: Optional[str],
+        password: Optional[str],
+        client: "RemappClient",
+    ) -> None:
+        self.token = token
+        self.username = username
+        self.password = password
+        self.client = client
+        self.refresh_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def can_refresh(self) -> bool:
+        return bool(self.username and self.password)
+
+    def refresh(self, stale_token: Optional[str]) -> Optional[str]:
+        """Return a token newer than ``stale_token``, logging in only if nobody else has."""
+        with self._lock:
+            if self.token and self.token != stale_token:
+                return self.token
+            if not self.can_refresh:
+                return None
+            try:
+                token = self.client.login(self.username, self.password)
+            except (requests.RequestException, RuntimeError) as exc:
+                # The caller gets its original 401 back and decides whether to retry
+                print(f"Re-login failed: {exc}")
+                self.client.metrics.increment("relogin_failures")
+                return None
+            save_env_value(ENV_PATH, "REMAPP_BEARER_TOKEN", token)
+            os.environ["REMAPP_BEARER_TOKEN"] = token
+            self.token = token
+            self.refresh_count += 1
+            if stale_token is not None:
+                self.client.metrics.increment("relogins")
+            return token
+
+
+class RemappClient:
+    """Shared HTTP client for the Remapp API.
+
+    All worker threads share one keep-alive ``requests.Session`` whose pool
+    holds a connection per worker, so connections are reused across calls,
+    phases and (in the refresh worker) runs instead of a new TCP+TLS handshake
+    each time. Authenticated calls that come back 401/403 are retried once
+    after a single-flight token refresh. Call ``close`` when done.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        pool_size: int = 10,
+        timeout: float = 30,
+        metrics: Optional[RunMetrics] = None,
+    ) -> None:
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.metrics = metrics or RunMetrics()
+        self.tokens = TokenManager(token, username, password, self)
+        self.list_requires_auth = False
+        # The executors each phase runs on are short-lived, so the pool belongs
+        # to the client rather than to their threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._headers_lock = threading.Lock()
+        self._headers_token: Optional[str] = None
+        self._headers = build_headers(None)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _auth_headers(self, token: str) -> Dict[str, str]:
+        with self._headers_lock:
+            if token != self._headers_token:
+                self._headers = build_headers(token)
+                self._headers_token = token
+            return self._headers
+
+    def _send(
+        self, endpoint: str, url: str, payload: Dict[str, Any], headers: Dict[str, str]
+    ) -> requests.Response:
+        started = time.perf_counter()
+        status: Optional[int] = None
+        size = 0
+        try:
+            response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+            status = response.status_code
+            # Content-Length is the compressed size actually sent over the wire
+            length = response.headers.get("Content-Length")
+            size = int(length) if length and length.isdigit() else len(response.content)
+            return response
+        finally:
+            self.metrics.record_request(endpoint, time.perf_counter() - started, status, size)
+
+    def post(
+        self, endpoint: str, url: str, payload: Dict[str, Any], authenticated: bool = True
+    ) -> requests.Response:
+        if not authenticated:
+            return self._send(endpoint, url, payload, build_headers(None))
+        token = self.tokens.token or self.tokens.refresh(None)
+        if not token:
+            return self._send(endpoint, url, payload, build_headers(None))
+        response = self._send(endpoint, url, payload, self._auth_headers(token))
+        if response.status_code in {401, 403} and self.tokens.can_refresh:
+            print(f"Received {response.status_code} for {endpoint}. Refreshing token...")
+            new_token = self.tokens.refresh(token)
+            if new_token:
+                response = self._send(endpoint, url, payload, self._auth_headers(new_token))
+        return response
+
+    def login(self, username: str, password: str) -> str:
+        payload = {"username": username, "password": password, "rememberMe": False}
+        response = self._send("login", LOGIN_URL, payload, LOGIN_HEADERS)
+        response.raise_for_status()
+        data = response.json()
+        token = extract_token(data)
+        if not token:
+            available_keys = ", ".join(sorted(data.keys())) if isinstance(data, dict) else ""
+            raise RuntimeError(
+                "Login succeeded but no token found in response. "
+                f"Top-level keys: {available_keys}"
+            )
+        return token
+
+    def fetch_page(self, page: int) -> Dict[str, Any]:
+        payload = {"page": page}
+        response = self.post("list", LIST_URL, payload, authenticated=self.list_requires_auth)
+        if response.status_code in {401, 403} and not self.list_requires_auth:
+            # The list is public unless the API says otherwise; remember the answer
+            self.list_requires_auth = True
+            if not self.tokens.token and not self.tokens.can_refresh:
+                raise SystemExit(AUTH_REQUIRED_MESSAGE)
+            response = self.post("list", LIST_URL, payload)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_detail(
+        self, slug: Optional[str], project_id: Optional[int]
+    ) -> Tuple[Dict[str, Any], int]:
+        payload: Dict[str, Any] = {}
+        if project_id is not None:
+            payload["fk_project_id"] = project_id
+        elif slug:
+            payload["slug"] = slug
+        else:
+            raise ValueError("Missing slug and id for project detail request.")
+
+        response = self.post("detail", DETAIL_URL, payload)
+        if response.status_code == 422 and slug:
+            response = self.post("detail", DETAIL_URL, {"slug": slug})
+        response.raise_for_status()
+        return response.json(), response.status_code
 
 
 def extract_projects(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -91,52 +289,6 @@ def get_total_pages(payload: Dict[str, Any]) -> Optional[int]:
     return None
 
 
-def fetch_detail(
-    slug: Optional[str], project_id: Optional[int], token: Optional[str]
-) -> Tuple[Dict[str, Any], int]:
-    payload: Dict[str, Any] = {}
-    if project_id is not None:
-        payload["fk_project_id"] = project_id
-    elif slug:
-        payload["slug"] = slug
-    else:
-        raise ValueError("Missing slug and id for project detail request.")
-
-    response = requests.post(
-        DETAIL_URL, headers=build_headers(token), json=payload, timeout=30
-    )
-    if response.status_code == 422 and slug:
-        payload = {"slug": slug}
-        response = requests.post(
-            DETAIL_URL, headers=build_headers(token), json=payload, timeout=30
-        )
-    response.raise_for_status()
-    return response.json(), response.status_code
-
-
-def login(username: str, password: str) -> str:
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Device": "2",
-        "Origin": "https://v3.remapp.ae",
-        "Referer": "https://v3.remapp.ae/",
-        "User-Agent": "Mozilla/5.0",
-    }
-    payload = {"username": username, "password": password, "rememberMe": False}
-    response = requests.post(LOGIN_URL, headers=headers, json=payload, timeout=30)
-    response.raise_for_status()
-    data = response.json()
-    token = extract_token(data)
-    if not token:
-        available_keys = ", ".join(sorted(data.keys())) if isinstance(data, dict) else ""
-        raise RuntimeError(
-            "Login succeeded but no token found in response. "
-            f"Top-level keys: {available_keys}"
-        )
-    return token
-
-
 def extract_token(payload: Any) -> Optional[str]:
     token_keys = {"token", "access_token", "api_token", "jwt"}
     if isinstance(payload, dict):
@@ -164,24 +316,9 @@ def load_incremental_state() -> Optional[Dict[str, Any]]:
         return None
 
 
-def load_batch_state() -> Dict[str, Any]:
-    """Load the detail batch rotation state."""
-    if not DETAIL_BATCH_STATE_PATH.is_file():
-        return {}
-    try:
-        return json.loads(DETAIL_BATCH_STATE_PATH.read_text(encoding="utf-8"))
-    except (json.JSONDecodeError, OSError):
-        return {}
-
-
-def save_batch_state(state: Dict[str, Any]) -> None:
-    """Persist the detail batch rotation state."""
-    DETAIL_BATCH_STATE_PATH.write_text(
-        json.dumps(state, ensure_ascii=True, indent=2), encoding="utf-8"
-    )
-
-
-def save_incremental_state(projects: List[Dict[str, Any]]) -> None:
+def save_incremental_state(
+    projects: List[Dict[str, Any]], list_sync: Optional["ListSyncResult"] = None
+) -> None:
     """Save the current fetch state for incremental updates."""
     if not projects:
         return
@@ -195,33 +332,360 @@ def save_incremental_state(projects: List[Dict[str, Any]]) -> None:
             if newest_created_at is None or created > newest_created_at:
                 newest_created_at = created
     
+    now = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    previous = load_incremental_state() or {}
+    last_full_sync = previous.get("last_full_sync_timestamp")
+    if list_sync is not None and list_sync.mode == "full":
+        last_full_sync = now
+
     state = {
-        "last_fetch_timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "last_fetch_timestamp": now,
         "highest_project_id": highest_id,
         "newest_created_at": newest_created_at,
         "total_projects": len(projects)
     }
+    if last_full_sync:
+        state["last_full_sync_timestamp"] = last_full_sync
+    if list_sync is not None:
+        state["last_list_sync"] = list_sync.summary()
     
     INCREMENTAL_STATE_PATH.write_text(json.dumps(state, ensure_ascii=True, indent=2), encoding="utf-8")
 
 
-def is_project_in_list(project_id: int, existing_projects: List[Dict[str, Any]]) -> bool:
-    """Check if a project ID exists in the existing project list."""
-    return any(p.get("id") == project_id for p in existing_projects if isinstance(p, dict))
+def save_delta(run_id: str, changes: List[Dict[str, Any]]) -> None:
+    """Write this run's changes, grouped by kind, to ``projects_delta.json``."""
+    delta: Dict[str, Any] = {
+        "run_id": run_id,
+        "from_seq": changes[0]["seq"] if changes else None,
+        "to_seq": changes[-1]["seq"] if changes else None,
+        "added": [],
+        "updated": [],
+        "removed": [],
+    }
+    for entry in changes:
+        record = {"id": entry["id"], "slug": entry["slug"]}
+        if entry["change"] == "updated":
+            record["paths"] = entry["paths"]
+        delta[entry["change"]].append(record)
+    DELTA_PATH.write_text(json.dumps(delta, ensure_ascii=True, indent=2), encoding="utf-8")
+
+
+def is_full_sync_due(state: Optional[Dict[str, Any]], max_age_hours: float) -> bool:
+    """True when the last full list sync is older than ``max_age_hours`` (or unknown)."""
+    if max_age_hours <= 0 or not state:
+        return False
+    value = state.get("last_full_sync_timestamp")
+    if not isinstance(value, str):
+        return True
+    try:
+        last_full_sync = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        return True
+    return time.time() - last_full_sync.timestamp() >= max_age_hours * 3600
+
+
+def project_key(project: Dict[str, Any]) -> Optional[Any]:
+    """Stable identity for a list entry: its id, or its slug when the id is missing."""
+    project_id = project.get("id")
+    if isinstance(project_id, int):
+        return project_id
+    slug = project.get("slug")
+    return slug if isinstance(slug, str) else None
+
+
+def record_hash(record: Dict[str, Any]) -> str:
+    """Content hash of a record, independent of key order."""
+    canonical = json.dumps(record, ensure_ascii=True, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+class ProjectIndex:
+    """Id/slug lookup over a project list with a content hash per entry."""
+
+    def __init__(self, projects: List[Dict[str, Any]]) -> None:
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self.by_slug: Dict[str, Dict[str, Any]] = {}
+        self.hashes: Dict[Any, str] = {}
+        for project in projects:
+            if not isinstance(project, dict):
+                continue
+            key = project_key(project)
+            if key is None or key in self.hashes:
+                continue
+            project_id = project.get("id")
+            slug = project.get("slug")
+            if isinstance(project_id, int):
+                self.by_id[project_id] = project
+            if isinstance(slug, str):
+                self.by_slug.setdefault(slug, project)
+            self.hashes[key] = record_hash(project)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def get(self, project: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        project_id = project.get("id")
+        if isinstance(project_id, int):
+            return self.by_id.get(project_id)
+        slug = project.get("slug")
+        return self.by_slug.get(slug) if isinstance(slug, str) else None
+
+    def is_changed(self, project: Dict[str, Any]) -> bool:
+        """True if the project is unknown or its content differs from the indexed copy."""
+        key = project_key(project)
+        return key not in self.hashes or self.hashes[key] != record_hash(project)
+
+
+@dataclass
+class ListSyncResult:
+    projects: List[Dict[str, Any]]
+    mode: str
+    pages_fetched: int = 0
+    added: List[Any] = field(default_factory=list)
+    updated: List[Any] = field(default_factory=list)
+    removed: List[Any] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "pages_fetched": self.pages_fetched,
+            "added": len(self.added),
+            "updated": len(self.updated),
+            "removed": len(self.removed),
+        }
+
+
+def dedupe_projects(projects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop repeated entries (e.g. from pages shifting mid-sync), keeping the first."""
+    seen: set = set()
+    unique: List[Dict[str, Any]] = []
+    for project in projects:
+        if not isinstance(project, dict):
+            continue
+        key = project_key(project)
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        unique.append(project)
+    return unique
+
+
+def fetch_all_pages(client: "RemappClient", workers: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Fetch the whole list; pages after the first are fetched in parallel."""
+    first_payload = client.fetch_page(1)
+    pages: Dict[int, List[Dict[str, Any]]] = {1: extract_projects(first_payload)}
+    if not pages[1]:
+        return [], 1
+    total_pages = get_total_pages(first_payload)
+    if total_pages is None:
+        # No pagination metadata: walk pages until one comes back empty
+        page = 2
+        while True:
+            page_projects = extract_projects(client.fetch_page(page))
+            if not page_projects:
+                break
+            pages[page] = page_projects
+            page += 1
+        pages_fetched = page
+    else:
+        remaining = list(range(2, total_pages + 1))
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for page, payload in zip(remaining, executor.map(client.fetch_page, remaining)):
+                pages[page] = extract_projects(payload)
+        pages_fetched = total_pages
+    projects = [project for page in sorted(pages) for project in pages[page]]
+    return dedupe_projects(projects), pages_fetched
+
+
+def sync_full(
+    client: "RemappClient", index: ProjectIndex, workers: int
+) -> ListSyncResult:
+    projects, pages_fetched = fetch_all_pages(client, workers)
+    fetched_keys = set()
+    result = ListSyncResult(projects=projects, mode="full", pages_fetched=pages_fetched)
+    for project in projects:
+        key = project_key(project)
+        fetched_keys.add(key)
+        if key not in index.hashes:
+            result.added.append(key)
+        elif index.is_changed(project):
+            result.updated.append(key)
+    result.removed = [key for key in index.hashes if key not in fetched_keys]
+    return result
+
+
+def sync_incremental(
+    client: "RemappClient",
+    existing_projects: List[Dict[str, Any]],
+    index: ProjectIndex,
+    max_pages: int = INCREMENTAL_PAGE_LIMIT,
+) -> Optional[ListSyncResult]:
+    """Walk the newest pages until one comes back with no new or changed entries.
+
+    Returns None when the result cannot be trusted and a full sync is needed:
+    the page cap was hit, or the API total shows that projects were removed.
+    Changes behind the first unchanged page, and an add offset by a removal,
+    are not seen; the periodic full sync (``REMAPP_FULL_SYNC_HOURS``) picks them up.
+    """
+    added: List[Dict[str, Any]] = []
+    updated: Dict[Any, Dict[str, Any]] = {}
+    api_total: Optional[int] = None
+    pages_fetched = 0
+    for page in range(1, max_pages + 1):
+        payload = client.fetch_page(page)
+        pages_fetched = page
+        if page == 1:
+            data = payload.get("data")
+            total = data.get("total") if isinstance(data, dict) else None
+            api_total = total if isinstance(total, int) else None
+        page_projects = extract_projects(payload)
+        if not page_projects:
+            break
+        page_changed = False
+        for project in page_projects:
+            if not isinstance(project, dict):
+                continue
+            if index.get(project) is None:
+                added.append(project)
+                page_changed = True
+            elif index.is_changed(project):
+                updated[project_key(project)] = project
+                page_changed = True
+        if not page_changed:
+            break
+        total_pages = get_total_pages(payload)
+        if total_pages is not None and page >= total_pages:
+            break
+    else:
+        print(f"Incremental sync reached the {max_pages}-page limit")
+        return None
+
+    added = dedupe_projects(added)
+    if api_total is not None and api_total != len(index) + len(added):
+        print(
+            f"List total changed to {api_total} (expected {len(index) + len(added)}); "
+            "projects were removed or reordered"
+        )
+        return None
+
+    projects = added + [
+        updated.get(project_key(project), project)
+        for project in existing_projects
+        if isinstance(project, dict)
+    ]
+    return ListSyncResult(
+        projects=dedupe_projects(projects),
+        mode="incremental",
+        pages_fetched=pages_fetched,
+        added=[project_key(project) for project in added],
+        updated=list(updated),
+    )
+
+
+def sync_project_list(
+    client: "RemappClient",
+    existing_projects: List[Dict[str, Any]],
+    incremental: bool,
+    workers: int = LIST_WORKERS,
+) -> ListSyncResult:
+    """Bring the project list up to date, falling back to a full sync when needed."""
+    index = ProjectIndex(existing_projects)
+    if incremental and len(index):
+        result = sync_incremental(client, existing_projects, index)
+        if result is not None:
+            return result
+        print("Falling back to full list sync")
+    return sync_full(client, index, workers)
+
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by detail workers.
+
+    The refill rate grows additively while requests succeed and is halved on a
+    429, which also pauses every worker until the server's Retry-After passes.
+    429s arriving during that pause come from requests already in flight, so
+    they only extend it and do not halve the rate again.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float = DETAIL_MIN_RATE,
+        max_rate: float = DETAIL_MAX_RATE,
+        step: float = DETAIL_RATE_STEP,
+    ) -> None:
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.step = step
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait_for = self._blocked_until - now
+                else:
+                    elapsed = now - max(self._updated, self._blocked_until)
+                    self._tokens = min(1.0, self._tokens + elapsed * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    wait_for = (1.0 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.step)
+
+    def on_throttle(self, retry_after: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._blocked_until:
+                self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            self._blocked_until = max(self._blocked_until, now + max(retry_after, 0.0))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
 
 
 def fetch_detail_with_retry(
+    client: RemappClient,
     slug: Optional[str],
     project_id: Optional[int],
-    token: Optional[str],
-    username: Optional[str] = None,
-    password: Optional[str] = None,
+    limiter: Optional[AdaptiveRateLimiter] = None,
 ) -> Dict[str, Any]:
-    current_token = token
     for attempt in range(MAX_RETRIES):
+        retry_after: Optional[float] = None
+        auth_failed = False
+        if limiter is not None:
+            limiter.acquire()
         try:
-            payload, status = fetch_detail(slug, project_id, current_token)
+            payload, status = client.fetch_detail(slug, project_id)
             if status != 429:
+                if limiter is not None:
+                    limiter.on_success()
                 return payload
         except requests.HTTPError as exc:
             status = exc.response.status_code if exc.response is not None else None
@@ -231,37 +695,172 @@ def fetch_detail_with_retry(
                 print(f"Project not found or invalid (status {status}) for slug={slug}, id={project_id}. Skipping.")
                 return {"error": f"Project not found (status {status})"}
 
-            # Handle unauthorized/forbidden by attempting re-login
-            if status in {401, 403} and username and password:
-                print(f"Received {status} for detail fetch. Attempting re-login...")
-                try:
-                    new_token = login(username, password)
-                    save_env_value(ENV_PATH, "REMAPP_BEARER_TOKEN", new_token)
-                    os.environ["REMAPP_BEARER_TOKEN"] = new_token
-                    current_token = new_token
-                    # Retry immediately with new token
-                    payload, status = fetch_detail(slug, project_id, current_token)
-                    if status != 429:
-                        return payload
-                except Exception as login_exc:
-                    print(f"Re-login failed during retry: {login_exc}")
-                    # Continue to logic below to handle 429 or raise original error
-            
             if status == 429:
-                pass
-            elif status in {401, 403} and (not username or not password):
-                raise  # No credentials to refresh with
-            elif status not in {401, 403}:
-                 raise # Re-raise other errors
+                if exc.response is not None:
+                    retry_after = parse_retry_after(exc.response.headers.get("Retry-After"))
+            elif status in {401, 403} and client.tokens.can_refresh:
+                # The re-login failed or its token was refused; back off and log in again
+                auth_failed = True
+            else:
+                raise
 
         sleep_for = RETRY_BACKOFF_SECONDS * (2**attempt)
-        time.sleep(sleep_for)
+        client.metrics.increment("retries")
+        if limiter is not None and not auth_failed:
+            # Back off globally so the other workers pause too
+            limiter.on_throttle(retry_after if retry_after is not None else sleep_for)
+        else:
+            time.sleep(retry_after if retry_after is not None else sleep_for)
 
-    raise RuntimeError("Exceeded retries due to rate limiting (429) or auth failures.")
+    raise RuntimeError("Exceeded retries due to rate limiting (429) or failed re-login.")
 
 
-def main() -> None:
-    load_env_file(ENV_PATH)
+def fetch_details_concurrently(
+    jobs: List[Tuple[Optional[str], Optional[int]]],
+    workers: int,
+    limiter: AdaptiveRateLimiter,
+    client: RemappClient,
+) -> Iterator[Tuple[Optional[str], Optional[int], Dict[str, Any]]]:
+    """Fetch details for (slug, id) jobs on a thread pool, yielding in completion order.
+
+    At most ``workers * 2`` jobs are queued at once so a fatal error stops the run
+    without firing off the rest of the catalogue.
+    """
+    pending_jobs = iter(jobs)
+    in_flight: Dict[Future, Tuple[Optional[str], Optional[int]]] = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def submit_next() -> bool:
+            job = next(pending_jobs, None)
+            if job is None:
+                return False
+            slug, project_id = job
+            future = executor.submit(
+                fetch_detail_with_retry, client, slug, project_id, limiter
+            )
+            in_flight[future] = job
+            return True
+
+        while len(in_flight) < workers * 2 and submit_next():
+            pass
+        try:
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    slug, project_id = in_flight.pop(future)
+                    yield slug, project_id, future.result()
+                    submit_next()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def parse_max_age_by_status(value: str) -> Dict[str, float]:
+    """Parse ``"Completed=720,Pre Sale=48"`` into a status -> max-age (hours) map."""
+    ages: Dict[str, float] = {}
+    for part in value.split(","):
+        if "=" not in part:
+            continue
+        status, hours = part.rsplit("=", 1)
+        try:
+            ages[status.strip()] = float(hours)
+        except ValueError:
+            print(f"Ignoring invalid max age for status {status.strip()!r}: {hours!r}")
+    return ages
+
+
+class ScraperSession:
+    """State kept between runs by a long-lived process such as the refresh worker.
+
+    Holds the HTTP client (with its token), the open project store and the
+    parsed list cache, so a run only pays for the network work. A one-shot run
+    uses a fresh session and closes it at the end. All runs of a session must
+    happen on the same thread, because the SQLite connection is tied to it.
+    """
+
+    def __init__(self) -> None:
+        self.client: Optional[RemappClient] = None
+        self.store: Optional[ProjectStore] = None
+        self.projects: Optional[List[Dict[str, Any]]] = None
+        self._projects_stamp: Optional[Tuple[int, int]] = None
+
+    def get_client(
+        self, metrics: RunMetrics, token: Optional[str], username: Optional[str],
+        password: Optional[str], pool_size: int,
+    ) -> RemappClient:
+        if self.client is None:
+            self.client = RemappClient(token, username, password, pool_size=pool_size, metrics=metrics)
+        self.client.metrics = metrics
+        return self.client
+
+    def get_store(self) -> ProjectStore:
+        if self.store is None:
+            self.store = ProjectStore(PROJECT_STORE_PATH)
+        return self.store
+
+    def load_projects(self) -> List[Dict[str, Any]]:
+        """The list cache, reparsed only if the file changed since it was last read or written."""
+        try:
+            stat = LIST_CACHE_PATH.stat()
+        except OSError:
+            return []
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        if self.projects is not None and stamp == self._projects_stamp:
+            print(f"Using {len(self.projects)} existing projects held in memory")
+            return self.projects
+        try:
+            projects = json.loads(LIST_CACHE_PATH.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            return []
+        print(f"Loaded {len(projects)} existing projects from {LIST_CACHE_PATH}")
+        self.projects = projects
+        self._projects_stamp = stamp
+        return projects
+
+    def save_projects(self, projects: List[Dict[str, Any]]) -> None:
+        LIST_CACHE_PATH.write_text(json.dumps(projects, ensure_ascii=True, indent=2))
+        stat = LIST_CACHE_PATH.stat()
+        self.projects = projects
+        self._projects_stamp = (stat.st_size, stat.st_mtime_ns)
+
+    def close(self) -> None:
+        if self.client is not None:
+            # The token survives in the environment, so a new client reuses it
+            self.client.close()
+            self.client = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+@contextlib.contextmanager
+def run_lock(metrics: RunMetrics) -> Iterator[None]:
+    """Hold an exclusive lock on ``RUN_LOCK_PATH`` so only one run writes the outputs."""
+    with RUN_LOCK_PATH.open("a") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print(f"Another scraper run holds {RUN_LOCK_PATH}; waiting for it to finish")
+            metrics.enter_phase("lock_wait")
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def run_scraper(
+    metrics: RunMetrics,
+    session: Optional[ScraperSession] = None,
+    incremental: Optional[bool] = None,
+) -> None:
+    """Run one refresh; ``incremental`` overrides REMAPP_INCREMENTAL_MODE when given.
+
+    ``incremental=False`` is a full refetch of the list (as ``POST /refresh?full=true``).
+    """
+    own_session = session is None
+    if session is None:
+        session = ScraperSession()
     rehydrate_only = (
         os.environ.get("REMAPP_REHYDRATE_ONLY", "0").strip().lower() in {"1", "true", "yes"}
     )
@@ -269,331 +868,258 @@ def main() -> None:
         os.environ.get("REMAPP_FORCE_DETAIL_REFRESH", "0").strip().lower()
         in {"1", "true", "yes"}
     )
-    detail_batch_size = int(os.environ.get("REMAPP_DETAIL_BATCH_SIZE", "0") or "0")
-    detail_batch_offset = int(os.environ.get("REMAPP_DETAIL_BATCH_OFFSET", "0") or "0")
-    detail_batch_auto = (
-        os.environ.get("REMAPP_DETAIL_BATCH_AUTO", "1").strip().lower()
-        in {"1", "true", "yes"}
+    # REMAPP_DETAIL_BATCH_SIZE is the older name for the per-run request budget
+    detail_budget = int(
+        os.environ.get("REMAPP_DETAIL_BUDGET")
+        or os.environ.get("REMAPP_DETAIL_BATCH_SIZE")
+        or "0"
+    )
+    detail_max_age_hours = float(os.environ.get("REMAPP_DETAIL_MAX_AGE_HOURS", "0") or "0")
+    detail_max_age_by_status = parse_max_age_by_status(
+        os.environ.get("REMAPP_DETAIL_MAX_AGE_BY_STATUS", "")
     )
     batch_until_complete = (
         os.environ.get("REMAPP_BATCH_UNTIL_COMPLETE", "0").strip().lower()
         in {"1", "true", "yes"}
     )
+    detail_workers = max(int(os.environ.get("REMAPP_DETAIL_WORKERS", "1") or "1"), 1)
+    list_workers = max(int(os.environ.get("REMAPP_LIST_WORKERS", str(LIST_WORKERS)) or "1"), 1)
+    # The full JSON files are rewritten whole, so they are only exported on
+    # request (or by a rehydrate run); server.js reads the offset index instead
+    export_json = (
+        os.environ.get("REMAPP_EXPORT_JSON", "1" if rehydrate_only else "0").strip().lower()
+        in {"1", "true", "yes"}
+    )
+    full_sync_hours = float(
+        os.environ.get("REMAPP_FULL_SYNC_HOURS", str(FULL_SYNC_HOURS)) or FULL_SYNC_HOURS
+    )
+    detail_max_rate = float(
+        os.environ.get("REMAPP_DETAIL_MAX_RATE", str(DETAIL_MAX_RATE)) or DETAIL_MAX_RATE
+    )
     token = os.environ.get("REMAPP_BEARER_TOKEN")
     username = os.environ.get("REMAPP_USERNAME") or os.environ.get("REMAPP_EMAIL")
     password = os.environ.get("REMAPP_PASSWORD")
-    if not token and username and password:
-        token = login(username, password)
-        save_env_value(ENV_PATH, "REMAPP_BEARER_TOKEN", token)
-        os.environ["REMAPP_BEARER_TOKEN"] = token
+    client = session.get_client(
+        metrics, token, username, password, pool_size=max(detail_workers, list_workers)
+    )
+    token_refreshes = client.tokens.refresh_count
+    metrics.enter_phase("login")
+    if not token and username and password and not client.tokens.refresh(None):
+        raise SystemExit("Login failed. Check REMAPP_USERNAME and REMAPP_PASSWORD in remapp_scraper/.env")
 
     all_projects: List[Dict[str, Any]] = []
     use_local_list = os.environ.get("REMAPP_USE_LOCAL_LIST", "1").strip() in {"1", "true", "yes"}
     incremental_mode = os.environ.get("REMAPP_INCREMENTAL_MODE", "1").strip() in {"1", "true", "yes"}
+    if incremental is not None:
+        incremental_mode = incremental
+        use_local_list = use_local_list and incremental
     
     # Load existing projects if available
-    existing_projects: List[Dict[str, Any]] = []
-    if LIST_CACHE_PATH.is_file():
-        try:
-            existing_projects = json.loads(LIST_CACHE_PATH.read_text(encoding="utf-8"))
-            print(f"Loaded {len(existing_projects)} existing projects from {LIST_CACHE_PATH}")
-        except (json.JSONDecodeError, OSError):
-            existing_projects = []
+    metrics.enter_phase("list_sync")
+    existing_projects = session.load_projects()
     
     # Load incremental state
     incremental_state = load_incremental_state() if incremental_mode else None
+    list_sync: Optional[ListSyncResult] = None
     
     if use_local_list and existing_projects and not incremental_mode:
         # Use cached list without incremental update
         all_projects = existing_projects
+        metrics.mode = "cached"
         print(f"Using cached list: {len(all_projects)} projects (incremental mode disabled)")
-    elif incremental_mode and existing_projects and incremental_state:
-        # Incremental mode: fetch only new projects
-        print(f"Incremental mode: checking for new projects (last highest ID: {incremental_state.get('highest_project_id')})")
-        new_projects: List[Dict[str, Any]] = []
-        page = 1
-        found_existing = False
-        
-        while not found_existing:
-            try:
-                payload = fetch_page(page, None)
-            except requests.HTTPError as exc:
-                status = exc.response.status_code if exc.response is not None else None
-                if status in {401, 403}:
-                    if not token and username and password:
-                        token = login(username, password)
-                        save_env_value(ENV_PATH, "REMAPP_BEARER_TOKEN", token)
-                        os.environ["REMAPP_BEARER_TOKEN"] = token
-                    if not token:
-                        raise SystemExit(
-                            "API requires auth. Set REMAPP_BEARER_TOKEN or login creds in remapp_scraper/.env"
-                        ) from exc
-                    payload = fetch_page(page, token)
-                else:
-                    raise
-            
-            page_projects = extract_projects(payload)
-            if not page_projects:
-                break
-            
-            # Check if we've reached projects we already have
-            for project in page_projects:
-                project_id = project.get("id")
-                if isinstance(project_id, int) and is_project_in_list(project_id, existing_projects):
-                    found_existing = True
-                    break
-                new_projects.append(project)
-            
-            if found_existing:
-                break
-            
-            page += 1
-            # Safety limit: don't fetch more than 10 pages in incremental mode
-            if page > 10:
-                print("Warning: Reached page limit in incremental mode, switching to full fetch")
-                incremental_mode = False
-                break
-        
-        if new_projects:
-            print(f"Found {len(new_projects)} new projects")
-            # Prepend new projects to existing list
-            all_projects = new_projects + existing_projects
-            LIST_CACHE_PATH.write_text(json.dumps(all_projects, ensure_ascii=True, indent=2))
-            print(f"Updated cache with {len(all_projects)} total projects")
-        else:
-            print("No new projects found")
-            all_projects = existing_projects
     else:
-        page = 1
-
-        while True:
-            try:
-                payload = fetch_page(page, None)
-            except requests.HTTPError as exc:
-                status = exc.response.status_code if exc.response is not None else None
-                if status in {401, 403}:
-                    # Token might be expired, try to refresh
-                    if username and password:
-                        print(f"Received {status} fetching list page {page}. Attempting re-login...")
-                        token = login(username, password)
-                        save_env_value(ENV_PATH, "REMAPP_BEARER_TOKEN", token)
-                        os.environ["REMAPP_BEARER_TOKEN"] = token
-                        payload = fetch_page(page, token)
-                    else:
-                        raise SystemExit(
-                            "API requires auth. Set REMAPP_BEARER_TOKEN or login creds in remapp_scraper/.env"
-                        ) from exc
-                else:
-                    raise
-            page_projects = extract_projects(payload)
-            if not page_projects:
-                break
-            all_projects.extend(page_projects)
-
-            total_pages = get_total_pages(payload)
-            if total_pages is not None and page >= total_pages:
-                break
+        use_incremental = bool(incremental_mode and existing_projects and incremental_state)
+        if use_incremental and is_full_sync_due(incremental_state, full_sync_hours):
+            # Changes deep in the list are only visible to a full sync
+            print(f"Last full list sync is older than {full_sync_hours:g}h; running a full sync")
+            use_incremental = False
+        if use_incremental:
+            print(
+                "Incremental mode: checking for new and changed projects "
+                f"(last highest ID: {incremental_state.get('highest_project_id')})"
+            )
+        list_sync = sync_project_list(client, existing_projects, use_incremental, list_workers)
+        all_projects = list_sync.projects
+        metrics.mode = list_sync.mode
+        print(
+            f"List sync ({list_sync.mode}, {list_sync.pages_fetched} pages): "
+            f"{len(list_sync.added)} new, {len(list_sync.updated)} updated, "
+            f"{len(list_sync.removed)} removed"
+        )
+        if list_sync.mode == "full" or list_sync.added or list_sync.updated:
+            session.save_projects(all_projects)
+            print(f"Saved {len(all_projects)} list items to {LIST_CACHE_PATH}")
+        else:
+            print("No new or changed projects found")
 
-            page += 1
+    metrics.enter_phase("jsonl_load")
+    store = session.get_store()
+    if store.sync_list(all_projects):
+        print(f"Updated {store.list_count()} list entries in {PROJECT_STORE_PATH}")
 
-        LIST_CACHE_PATH.write_text(json.dumps(all_projects, ensure_ascii=True, indent=2))
-        print(f"Saved {len(all_projects)} list items to {LIST_CACHE_PATH}")
-
-    details: List[Dict[str, Any]] = []
-    seen_ids: set[int] = set()
-    seen_slugs: set[str] = set()
-    if DETAILS_JSONL_PATH.is_file() and not force_detail_refresh:
-        for raw_line in DETAILS_JSONL_PATH.read_text(encoding="utf-8").splitlines():
-            raw_line = raw_line.strip()
-            if not raw_line:
-                continue
-            try:
-                detail = json.loads(raw_line)
-            except json.JSONDecodeError:
-                continue
-            if isinstance(detail, dict):
-                detail_id = detail.get("fk_project_id") or detail.get("id")
-                detail_slug = detail.get("slug")
-                if isinstance(detail_id, int):
-                    seen_ids.add(detail_id)
-                if isinstance(detail_slug, str):
-                    seen_slugs.add(detail_slug)
-                details.append(detail)
-
-    if details:
-        print(f"Resuming with {len(details)} cached details from {DETAILS_JSONL_PATH}")
+    # Only lines appended to the log since the last run are parsed
+    imported = store.import_jsonl(DETAILS_JSONL_PATH)
+    if imported:
+        print(f"Imported {imported} new or changed details from {DETAILS_JSONL_PATH}")
+    if store.detail_count():
+        print(f"Resuming with {store.detail_count()} cached details from {PROJECT_STORE_PATH}")
 
     if rehydrate_only:
+        metrics.mode = "rehydrate"
         print("Rehydrate-only mode: skipping API calls.")
     else:
-        total = len(all_projects)
+        metrics.enter_phase("detail_fetch")
+        run_started = time.time()
+        # A full forced refetch replaces the logs; a budgeted one only appends
+        log_mode = "w" if (force_detail_refresh and detail_budget <= 0) else "a"
+        if log_mode == "w":
+            store.reset_jsonl_offset(DETAILS_JSONL_PATH)
+        limiter = AdaptiveRateLimiter(1 / DETAIL_SLEEP_SECONDS, max_rate=detail_max_rate)
         while True:
-            skipped = 0
+            plan = store.plan_detail_refresh(
+                budget=detail_budget,
+                max_age_hours=detail_max_age_hours,
+                max_age_by_status=detail_max_age_by_status,
+                refresh_before=run_started if force_detail_refresh else None,
+            )
+            jobs = plan.jobs
+            metrics.increment("details_planned", len(jobs))
+            print(f"Detail refresh plan: {plan.summary()}")
+            if jobs:
+                print(f"Fetching {len(jobs)} project details with {detail_workers} worker(s)")
             missing_details = 0
-            batch_end = total
-            if detail_batch_size > 0:
-                if detail_batch_auto:
-                    batch_state = load_batch_state()
-                    state_offset = batch_state.get("next_offset")
-                    if isinstance(state_offset, int):
-                        detail_batch_offset = state_offset
-                detail_batch_offset = max(detail_batch_offset, 0)
-                if detail_batch_offset >= total and total > 0:
-                    detail_batch_offset = 0
-                batch_end = min(detail_batch_offset + detail_batch_size, total)
-                print(
-                    "Batch mode: processing "
-                    f"{detail_batch_offset + 1}..{batch_end} of {total}"
-                )
-            details_mode = "w" if (force_detail_refresh and detail_batch_offset == 0) else "a"
-            error_mode = "w" if (force_detail_refresh and detail_batch_offset == 0) else "a"
-            with DETAILS_JSONL_PATH.open(details_mode, encoding="utf-8") as progress_file:
-                error_file = DETAILS_ERROR_PATH.open(error_mode, encoding="utf-8")
-                for index, item in enumerate(all_projects, start=1):
-                    if detail_batch_size > 0:
-                        if index <= detail_batch_offset or index > batch_end:
-                            continue
-                    slug = item.get("slug") if isinstance(item, dict) else None
-                    project_id = item.get("id") if isinstance(item, dict) else None
-
-                    if not slug and project_id is None:
-                        skipped += 1
-                        if index % LOG_EVERY == 0:
-                            print(f"Progress: {index}/{total} (skipped {skipped})")
-                        continue
-
-                    if not force_detail_refresh:
-                        # Check by ID first (most reliable)
-                        if isinstance(project_id, int) and project_id in seen_ids:
-                            if index % LOG_EVERY == 0:
-                                print(f"Progress: {index}/{total} (cached by ID)")
-                            continue
-                        # Fallback to slug only if ID is missing
-                        if project_id is None and isinstance(slug, str) and slug in seen_slugs:
-                            if index % LOG_EVERY == 0:
-                                print(f"Progress: {index}/{total} (cached by slug)")
-                            continue
-
-                    try:
-                        detail_payload = fetch_detail_with_retry(slug, project_id, token, username, password)
-                    except requests.HTTPError as exc:
-                        # fetch_detail_with_retry handles 401/403 retry looping internally if creds are provided
-                        # If it raises HTTPError here, it means it couldn't recover
-                        raise
-
-                    detail_data = (
-                        detail_payload.get("data") if isinstance(detail_payload, dict) else None
-                    )
-                    if isinstance(detail_data, dict):
-                        if isinstance(project_id, int):
-                            detail_data = dict(detail_data)
-                            detail_data["fk_project_id"] = project_id
-                        details.append(detail_data)
-                        progress_file.write(json.dumps(detail_data, ensure_ascii=True) + "\n")
-                        progress_file.flush()
-                        detail_id = detail_data.get("fk_project_id") or detail_data.get("id")
-                        detail_slug = detail_data.get("slug")
-                        if isinstance(detail_id, int):
-                            seen_ids.add(detail_id)
-                        if isinstance(detail_slug, str):
-                            seen_slugs.add(detail_slug)
-                    else:
-                        missing_details += 1
-                        error_file.write(
-                            json.dumps(
-                                {
-                                    "id": project_id,
-                                    "slug": slug,
-                                    "response": detail_payload,
-                                },
-                                ensure_ascii=True,
-                            )
-                            + "\n"
-                        )
-                        error_file.flush()
-
-                    if index % LOG_EVERY == 0:
-                        print(
-                            f"Progress: {index}/{total} (skipped {skipped}, missing {missing_details})"
+            unchanged = 0
+            fetched = 0
+            with DETAILS_JSONL_PATH.open(log_mode, encoding="utf-8") as progress_file:
+                error_file = DETAILS_ERROR_PATH.open(log_mode, encoding="utf-8")
+                try:
+                    # Results are written from this thread only, so every finished
+                    # project lands as one complete line and resume keeps working
+                    for slug, project_id, detail_payload in fetch_details_concurrently(
+                        jobs, detail_workers, limiter, client
+                    ):
+                        fetched += 1
+                        metrics.increment("projects_fetched")
+                        detail_data = (
+                            detail_payload.get("data") if isinstance(detail_payload, dict) else None
                         )
+                        if isinstance(detail_data, dict):
+                            if isinstance(project_id, int):
+                                detail_data = dict(detail_data)
+                                detail_data["fk_project_id"] = project_id
+                            progress_file.write(json.dumps(detail_data, ensure_ascii=True) + "\n")
+                            progress_file.flush()
+                        else:
+                            missing_details += 1
+                            metrics.increment("details_missing")
+                            error_file.write(
+                                json.dumps(
+                                    {
+                                        "id": project_id,
+                                        "slug": slug,
+                                        "response": detail_payload,
+                                    },
+                                    ensure_ascii=True,
+                                )
+                                + "\n"
+                            )
+                            error_file.flush()
+                        key = list_key({"id": project_id, "slug": slug})
+                        if key is not None and not store.record_fetch(
+                            key, detail_data if isinstance(detail_data, dict) else detail_payload
+                        ):
+                            unchanged += 1
 
-                    time.sleep(DETAIL_SLEEP_SECONDS)
-                error_file.close()
-
-            next_offset = 0
-            if detail_batch_size > 0 and detail_batch_auto and total > 0:
-                next_offset = batch_end
-                if next_offset >= total:
-                    next_offset = 0
-                save_batch_state(
-                    {
-                        "next_offset": next_offset,
-                        "last_total": total,
-                        "last_run": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
-                        "batch_size": detail_batch_size,
-                    }
+                        if fetched % LOG_EVERY == 0:
+                            print(
+                                f"Progress: {fetched}/{len(jobs)} fetched "
+                                f"(missing {missing_details}, unchanged {unchanged}, "
+                                f"rate {limiter.rate:.1f}/s)"
+                            )
+                finally:
+                    error_file.close()
+            log_mode = "a"
+            if fetched:
+                print(
+                    f"Fetched {fetched} details ({missing_details} missing, "
+                    f"{unchanged} unchanged since their last fetch)"
                 )
-            
+
             # Check if we should continue for the next cycle
-            if batch_until_complete and next_offset != 0:
-                print(f"Full Cycle Mode: Continuing to next batch (offset {next_offset})")
+            if batch_until_complete and jobs and plan.deferred:
+                print(f"Full Cycle Mode: continuing with {plan.deferred} deferred details")
                 continue
             else:
                 break
 
-    details_output_path = OUTPUT_DIR / "projects_details.json"
-    details_output_path.write_text(json.dumps(details, ensure_ascii=True, indent=2))
-    print(f"Saved {len(details)} project details to {details_output_path}")
-
-    details_by_id: Dict[int, Dict[str, Any]] = {}
-    details_by_slug: Dict[str, Dict[str, Any]] = {}
-    details_by_fk: Dict[int, Dict[str, Any]] = {}
-    for detail in details:
-        if not isinstance(detail, dict):
-            continue
-        detail_fk = detail.get("fk_project_id")
-        detail_id = detail_fk or detail.get("id")
-        detail_slug = detail.get("slug")
-        if isinstance(detail_id, int):
-            details_by_id[detail_id] = detail
-        if isinstance(detail_slug, str):
-            details_by_slug[detail_slug] = detail
-        if isinstance(detail_fk, int):
-            details_by_fk[detail_fk] = detail
-
-    merged: List[Dict[str, Any]] = []
-    for item in all_projects:
-        if not isinstance(item, dict):
-            continue
-        item_id = item.get("id")
-        item_slug = item.get("slug")
-        detail = None
-        if isinstance(item_id, int):
-            detail = details_by_id.get(item_id)
-        if detail is None and isinstance(item_slug, str):
-            detail = details_by_slug.get(item_slug)
-        if detail is None:
-            merged.append(item)
-            continue
-        combined = dict(item)
-        combined["details"] = detail
-        merged.append(combined)
-        if isinstance(item_id, int):
-            details_by_fk[item_id] = detail
-
-    merged_output_path = OUTPUT_DIR / "projects_merged.json"
-    merged_output_path.write_text(json.dumps(merged, ensure_ascii=True, indent=2))
-    print(f"Saved {len(merged)} merged projects to {merged_output_path}")
-
-    details_by_fk_path = OUTPUT_DIR / "projects_details_by_fk.json"
-    details_by_fk_path.write_text(json.dumps(details_by_fk, ensure_ascii=True, indent=2))
-    print(f"Saved {len(details_by_fk)} details by fk to {details_by_fk_path}")
+    metrics.enter_phase("merge")
+    changed = store.import_jsonl(DETAILS_JSONL_PATH)
+    print(f"Stored {changed} new or changed details ({store.detail_count()} total)")
+    log_size = DETAILS_JSONL_PATH.stat().st_size if DETAILS_JSONL_PATH.is_file() else 0
+    if store.compact_jsonl(DETAILS_JSONL_PATH):
+        print(
+            f"Compacted {DETAILS_JSONL_PATH} from {log_size} to "
+            f"{DETAILS_JSONL_PATH.stat().st_size} bytes"
+        )
+    run_id = time.strftime("%Y%m%dT%H%M%S%z", time.localtime(metrics.started_at))
+    changes = store.flush_changelog(run_id, CHANGES_JSONL_PATH)
+    save_delta(run_id, changes)
+    counts = {"added": 0, "updated": 0, "removed": 0}
+    for entry in changes:
+        counts[entry["change"]] += 1
+    print(
+        f"Delta feed: {counts['added']} added, {counts['updated']} updated, "
+        f"{counts['removed']} removed (cursor {changes[-1]['seq'] if changes else 'unchanged'})"
+    )
+    metrics.enter_phase("writes")
+    if export_json:
+        if not store.export_json(OUTPUT_DIR, force=rehydrate_only):
+            print("Store unchanged since last export; JSON outputs are up to date")
+    store.export_index(OUTPUT_DIR, force=rehydrate_only)
+    if own_session:
+        session.close()
     
     # Save incremental state for next run
-    if incremental_mode and all_projects:
-        save_incremental_state(all_projects)
+    if (incremental_mode or list_sync is not None) and all_projects:
+        save_incremental_state(all_projects, list_sync)
         print(f"Saved incremental state to {INCREMENTAL_STATE_PATH}")
 
+    if metrics.latency:
+        print(
+            f"HTTP: {metrics.request_summary()} "
+            f"(token refreshes: {client.tokens.refresh_count - token_refreshes})"
+        )
+
+
+def run_with_metrics(
+    metrics: RunMetrics,
+    session: Optional[ScraperSession] = None,
+    incremental: Optional[bool] = None,
+) -> None:
+    """Run the scraper under the run lock and record how the run ended in ``metrics``.
+
+    Metrics are only written once the lock is held, so a run waiting for it
+    does not overwrite the metrics of the run in progress.
+    """
+    metrics_interval = float(
+        os.environ.get("REMAPP_METRICS_INTERVAL", str(METRICS_INTERVAL_SECONDS))
+        or METRICS_INTERVAL_SECONDS
+    )
+    with run_lock(metrics):
+        metrics.start_periodic(metrics_interval)
+        try:
+            run_scraper(metrics, session, incremental)
+        except BaseException:
+            metrics.finish("failed")
+            raise
+        metrics.finish("completed")
+    print(f"Saved run metrics to {metrics.json_path} and {metrics.prom_path}")
+
+
+def main() -> None:
+    load_env_file(ENV_PATH)
+    run_with_metrics(RunMetrics(METRICS_JSON_PATH, METRICS_PROM_PATH))
+
 
 if __name__ == "__main__":
     main()
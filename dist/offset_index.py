@@ -0,0 +1,236 @@
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+
+INDEX_FILENAME = "projects_index.bin"
+LIST_DATA_FILENAME = "projects_list.jsonl"
+DETAILS_DATA_FILENAME = "projects_details_by_fk.jsonl"
+
+# Layout (little-endian): header, then list positions in list order, then
+# details sorted by fk id, then details sorted by slug hash. Every entry is
+# fixed width, so a page or a lookup touches only the bytes it needs.
+#
+# The data files are append-only between compactions: a changed record is
+# appended and its entry repointed, so earlier offsets stay valid. The header
+# records each data file's inode and the size the index covers; a reader
+# accepts the file if it is the same inode and at least that long.
+MAGIC = b"RMPIDX01"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sIIIIIqdQQQQ")
+POSITION_ENTRY = struct.Struct("<QI")  # offset, length
+ID_ENTRY = struct.Struct("<qQI")  # fk id, offset, length
+SLUG_ENTRY = struct.Struct("<QQI")  # slug hash, offset, length
+
+MappedData = Union[mmap.mmap, bytes]
+# (inode, size) of a data file
+FileStamp = Tuple[int, int]
+Span = Tuple[int, int]
+
+
+def slug_hash(slug: str) -> int:
+    """First 8 bytes of the slug's sha1 as an unsigned int (the same in server.js)."""
+    return int.from_bytes(hashlib.sha1(slug.encode("utf-8")).digest()[:8], "little")
+
+
+def file_stamp(path: Path) -> Optional[FileStamp]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size
+
+
+def write_records(
+    path: Path, records: Iterable[Tuple[str, str]], append: bool = False
+) -> Dict[str, Span]:
+    """Write ``(key, json_text)`` records one per line; return each key's (offset, length).
+
+    With ``append`` the records are added to the end of the existing file, so
+    readers holding an older index keep seeing valid offsets. Otherwise the
+    file is truncated; rewrite a temp file and move it into place together
+    with the index that points into it.
+    """
+    spans: Dict[str, Span] = {}
+    with path.open("ab" if append else "wb") as handle:
+        offset = handle.tell()
+        for key, text in records:
+            line = text.encode("utf-8")
+            handle.write(line + b"\n")
+            spans[key] = (offset, len(line))
+            offset += len(line) + 1
+    return spans
+
+
+def write_index(
+    output_dir: Path,
+    positions: List[Span],
+    by_id: List[Tuple[int, int, int]],
+    by_slug: Dict[int, Span],
+    titled: int,
+    data_version: int,
+    list_stamp: FileStamp,
+    details_stamp: FileStamp,
+) -> None:
+    """Write ``projects_index.bin`` atomically; ``by_id`` is (fk id, offset, length)."""
+    index_path = output_dir / INDEX_FILENAME
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    with tmp_path.open("wb") as handle:
+        handle.write(
+            HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                len(positions),
+                len(by_id),
+                len(by_slug),
+                titled,
+                data_version,
+                time.time(),
+                list_stamp[0],
+                list_stamp[1],
+                details_stamp[0],
+                details_stamp[1],
+            )
+        )
+        for offset, length in positions:
+            handle.write(POSITION_ENTRY.pack(offset, length))
+        for fk_id, offset, length in sorted(by_id):
+            handle.write(ID_ENTRY.pack(fk_id, offset, length))
+        for hashed in sorted(by_slug):
+            handle.write(SLUG_ENTRY.pack(hashed, *by_slug[hashed]))
+    os.replace(tmp_path, index_path)
+
+
+@dataclass
+class IndexCounts:
+    list: int
+    details: int
+    slugs: int
+    titled: int
+    data_version: int
+    generated_at: float
+
+
+class OffsetIndex:
+    """Read-only view of ``projects_index.bin`` and its JSONL data files via mmap.
+
+    Lookups binary-search the fixed-width tables and parse a single record, so
+    memory and latency do not grow with the catalogue. Use ``OffsetIndex.open``,
+    which returns None when the index is missing or out of step with the data.
+    """
+
+    def __init__(self, index: mmap.mmap, list_data: MappedData, details_data: MappedData) -> None:
+        self._index = index
+        self._list = list_data
+        self._details = details_data
+        fields = HEADER.unpack_from(index, 0)
+        (_, _, list_count, detail_count, slug_count, titled, data_version, generated_at) = fields[:8]
+        self.counts = IndexCounts(
+            list_count, detail_count, slug_count, titled, data_version, generated_at
+        )
+        self._positions_at = HEADER.size
+        self._ids_at = self._positions_at + list_count * POSITION_ENTRY.size
+        self._slugs_at = self._ids_at + detail_count * ID_ENTRY.size
+
+    @classmethod
+    def open(cls, output_dir: Path) -> Optional["OffsetIndex"]:
+        paths = (
+            output_dir / INDEX_FILENAME,
+            output_dir / LIST_DATA_FILENAME,
+            output_dir / DETAILS_DATA_FILENAME,
+        )
+        handles: List[Any] = []
+        try:
+            handles = [path.open("rb") for path in paths]
+            fields = HEADER.unpack(handles[0].read(HEADER.size))
+            if fields[0] != MAGIC or fields[1] != FORMAT_VERSION:
+                return None
+            # Checked on the open handles, so the files mapped are the ones checked
+            expected = ((fields[8], fields[9]), (fields[10], fields[11]))
+            for handle, (inode, size) in zip(handles[1:], expected):
+                stat = os.fstat(handle.fileno())
+                if stat.st_ino != inode or stat.st_size < size:
+                    return None
+            return cls(*(_map(handle) for handle in handles))
+        except (OSError, ValueError, struct.error):
+            return None
+        finally:
+            for handle in handles:
+                handle.close()
+
+    def close(self) -> None:
+        for view in (self._index, self._list, self._details):
+            if isinstance(view, mmap.mmap):
+                view.close()
+
+    def __enter__(self) -> "OffsetIndex":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _position(self, index: int) -> Tuple[int, int]:
+        return POSITION_ENTRY.unpack_from(self._index, self._positions_at + index * POSITION_ENTRY.size)
+
+    def page(self, page: int, per_page: int) -> List[Dict[str, Any]]:
+        """List entries on a 1-based page."""
+        start = (max(page, 1) - 1) * per_page
+        end = min(start + per_page, self.counts.list)
+        items = []
+        for index in range(start, end):
+            offset, length = self._position(index)
+            items.append(json.loads(self._list[offset:offset + length]))
+        return items
+
+    def _search(self, at: int, count: int, entry: struct.Struct, key: int) -> Optional[int]:
+        table = _Table(self._index, at, count, entry)
+        position = bisect.bisect_left(table, key)
+        return position if position < count and table[position] == key else None
+
+    def detail_by_id(self, project_id: int) -> Optional[Dict[str, Any]]:
+        position = self._search(self._ids_at, self.counts.details, ID_ENTRY, project_id)
+        if position is None:
+            return None
+        _, offset, length = ID_ENTRY.unpack_from(self._index, self._ids_at + position * ID_ENTRY.size)
+        return json.loads(self._details[offset:offset + length])
+
+    def detail_by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
+        position = self._search(self._slugs_at, self.counts.slugs, SLUG_ENTRY, slug_hash(slug))
+        if position is None:
+            return None
+        _, offset, length = SLUG_ENTRY.unpack_from(
+            self._index, self._slugs_at + position * SLUG_ENTRY.size
+        )
+        detail = json.loads(self._details[offset:offset + length])
+        # A hash collision between two slugs is possible, if unlikely
+        return detail if detail.get("slug") == slug else None
+
+
+class _Table:
+    """Sequence view over the first field of a fixed-width table, for bisect."""
+
+    def __init__(self, data: mmap.mmap, at: int, count: int, entry: struct.Struct) -> None:
+        self._data = data
+        self._at = at
+        self._count = count
+        self._entry = entry
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> int:
+        return self._entry.unpack_from(self._data, self._at + index * self._entry.size)[0]
+
+
+def _map(handle: Any) -> MappedData:
+    # mmap refuses empty files; an empty catalogue has nothing to map
+    if os.fstat(handle.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
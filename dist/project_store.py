@@ -0,0 +1,944 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from offset_index import (
+    DETAILS_DATA_FILENAME,
+    INDEX_FILENAME,
+    LIST_DATA_FILENAME,
+    FileStamp,
+    OffsetIndex,
+    Span,
+    file_stamp,
+    slug_hash,
+    write_index,
+    write_records,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    key TEXT PRIMARY KEY,
+    id INTEGER,
+    slug TEXT,
+    position INTEGER NOT NULL,
+    list_json TEXT NOT NULL,
+    list_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS projects_id ON projects (id);
+CREATE INDEX IF NOT EXISTS projects_slug ON projects (slug);
+CREATE INDEX IF NOT EXISTS projects_position ON projects (position);
+
+CREATE TABLE IF NOT EXISTS details (
+    key TEXT PRIMARY KEY,
+    fk_project_id INTEGER,
+    slug TEXT,
+    detail_json TEXT NOT NULL,
+    detail_hash TEXT NOT NULL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS details_fk ON details (fk_project_id);
+CREATE INDEX IF NOT EXISTS details_slug ON details (slug);
+
+CREATE TABLE IF NOT EXISTS freshness (
+    key TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    list_hash TEXT,
+    detail_hash TEXT
+);
+
+CREATE TABLE IF NOT EXISTS changelog (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    id INTEGER,
+    slug TEXT,
+    change TEXT NOT NULL,
+    paths TEXT NOT NULL,
+    record_hash TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changelog_key ON changelog (key);
+
+CREATE TABLE IF NOT EXISTS pending_changes (
+    key TEXT PRIMARY KEY,
+    change TEXT NOT NULL,
+    paths TEXT NOT NULL,
+    slug TEXT
+);
+
+-- Where each record lives in the offset index data files, and the hash written
+CREATE TABLE IF NOT EXISTS index_spans (
+    file TEXT NOT NULL,
+    key TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    titled INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (file, key)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+IMPORT_BATCH_SIZE = 500
+MAX_CHANGE_PATHS = 200
+FAILED_RETRY_HOURS = 24.0
+# Offset index data files are compacted once dead bytes exceed live bytes
+# (and this floor, so small catalogues are not rewritten on every change)
+INDEX_COMPACT_MIN_BYTES = 1024 * 1024
+# The detail log is rewritten from the store once it is this many times the
+# size of the details it holds; refetches otherwise grow it without bound
+JSONL_COMPACT_RATIO = 3
+
+
+def list_key(project: Dict[str, Any]) -> Optional[str]:
+    """Store key for a list entry: its id, or ``slug:<slug>`` when the id is missing."""
+    project_id = project.get("id")
+    if isinstance(project_id, int):
+        return str(project_id)
+    slug = project.get("slug")
+    return f"slug:{slug}" if isinstance(slug, str) else None
+
+
+def detail_key(detail: Dict[str, Any]) -> Optional[str]:
+    """Store key for a detail; matches ``list_key`` of the list entry it belongs to."""
+    detail_id = detail.get("fk_project_id") or detail.get("id")
+    if isinstance(detail_id, int):
+        return str(detail_id)
+    slug = detail.get("slug")
+    return f"slug:{slug}" if isinstance(slug, str) else None
+
+
+def dumps_compact(record: Dict[str, Any]) -> str:
+    # Key order is kept so exported files match what the API returned
+    return json.dumps(record, ensure_ascii=True, separators=(",", ":"))
+
+
+def content_hash(serialized: str) -> str:
+    return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+
+def diff_paths(old: Any, new: Any, prefix: str = "", limit: int = MAX_CHANGE_PATHS) -> List[str]:
+    """Paths where ``old`` and ``new`` differ, e.g. ``details.all_images[3]``.
+
+    Dicts are compared key by key and lists index by index. At most ``limit``
+    paths are returned; past that the common parent is reported instead.
+    """
+    paths: List[str] = []
+
+    def walk(a: Any, b: Any, path: str) -> None:
+        if len(paths) >= limit or a == b:
+            return
+        if isinstance(a, dict) and isinstance(b, dict):
+            for key in list(a) + [key for key in b if key not in a]:
+                walk(a.get(key), b.get(key), f"{path}.{key}" if path else str(key))
+        elif isinstance(a, list) and isinstance(b, list):
+            for index in range(max(len(a), len(b))):
+                walk(
+                    a[index] if index < len(a) else None,
+                    b[index] if index < len(b) else None,
+                    f"{path}[{index}]",
+                )
+        else:
+            paths.append(path)
+
+    walk(old, new, prefix)
+    return paths
+
+
+def last_jsonl_seq(path: Path) -> int:
+    """``seq`` of the last complete line of a changelog JSONL file (0 if there is none)."""
+    try:
+        with path.open("rb") as handle:
+            handle.seek(0, os.SEEK_END)
+            end = handle.tell()
+            start = max(end - 64 * 1024, 0)
+            handle.seek(start)
+            tail = handle.read()
+    except OSError:
+        return 0
+    for line in reversed(tail.split(b"\n")):
+        try:
+            return int(json.loads(line)["seq"])
+        except (ValueError, KeyError, TypeError):
+            continue
+    return 0
+
+
+def _ends_with_newline(path: Path) -> bool:
+    with path.open("rb") as handle:
+        handle.seek(-1, os.SEEK_END)
+        return handle.read(1) == b"\n"
+
+
+def _indented(value: Any) -> str:
+    """Render ``value`` as it appears nested one level inside ``json.dumps(..., indent=2)``."""
+    return json.dumps(value, ensure_ascii=True, indent=2).replace("\n", "\n  ")
+
+
+def write_json_array(path: Path, items: Iterable[Any]) -> int:
+    """Stream ``items`` to ``path`` as an indented JSON array, replacing it atomically."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    count = 0
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        for item in items:
+            handle.write("[\n  " if count == 0 else ",\n  ")
+            handle.write(_indented(item))
+            count += 1
+        handle.write("\n]" if count else "[]")
+    os.replace(tmp_path, path)
+    return count
+
+
+def write_json_object(path: Path, pairs: Iterable[Tuple[str, Any]]) -> int:
+    """Stream ``pairs`` to ``path`` as an indented JSON object, replacing it atomically."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    count = 0
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        for key, value in pairs:
+            handle.write("{\n  " if count == 0 else ",\n  ")
+            handle.write(f"{json.dumps(str(key))}: {_indented(value)}")
+            count += 1
+        handle.write("\n}" if count else "{}")
+    os.replace(tmp_path, path)
+    return count
+
+
+@dataclass
+class DetailRefreshPlan:
+    """Projects whose details should be fetched this run, in priority order."""
+
+    jobs: List[Tuple[Optional[str], Optional[int]]] = field(default_factory=list)
+    missing: int = 0
+    changed: int = 0
+    stale: int = 0
+    deferred: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.missing} missing, {self.changed} changed in list, "
+            f"{self.stale} stale; {self.deferred} deferred to later runs"
+        )
+
+
+class ProjectStore:
+    """SQLite store for list entries and details, keyed by project id and slug.
+
+    ``projects_details.jsonl`` stays the append-only log the scraper writes to;
+    the store catches up on it from the last imported byte offset, so each run
+    only parses the lines it appended, and ``compact_jsonl`` rewrites it once
+    refetched details make up most of it. The legacy JSON files are exported from
+    the store on request, and only when its contents changed since the last export.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(details)")}
+        if "status" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE details ADD COLUMN status TEXT")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "ProjectStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # -- meta ---------------------------------------------------------------
+
+    def get_meta(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, name: str, value: Any) -> None:
+        self.conn.execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, str(value)),
+        )
+
+    @property
+    def data_version(self) -> int:
+        return int(self.get_meta("data_version", "0") or 0)
+
+    def _bump_version(self) -> None:
+        self.set_meta("data_version", self.data_version + 1)
+
+    def _note_change(
+        self, key: str, change: str, paths: List[str], slug: Optional[str] = None
+    ) -> None:
+        """Coalesce a change into ``pending_changes`` until ``flush_changelog``.
+
+        Called inside the transaction that writes the record, so a run that
+        fails before flushing still reports the change on the next run.
+        """
+        row = self.conn.execute(
+            "SELECT change, paths, slug FROM pending_changes WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            entry = {"change": change, "paths": [], "slug": slug}
+        else:
+            entry = {"change": row[0], "paths": json.loads(row[1]), "slug": row[2]}
+            if change == "removed" or entry["change"] == "removed":
+                entry["change"] = change
+                entry["paths"] = []
+        if slug:
+            entry["slug"] = slug
+        if entry["change"] == "updated":
+            entry["paths"].extend(path for path in paths if path not in entry["paths"])
+        self.conn.execute(
+            "INSERT INTO pending_changes (key, change, paths, slug) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET change = excluded.change, "
+            "paths = excluded.paths, slug = excluded.slug",
+            (key, entry["change"], json.dumps(entry["paths"]), entry["slug"]),
+        )
+
+    # -- list ---------------------------------------------------------------
+
+    def sync_list(self, projects: List[Dict[str, Any]]) -> int:
+        """Make the stored list match ``projects``; returns the number of rows written."""
+        existing = {
+            key: (position, list_hash, slug)
+            for key, position, list_hash, slug in self.conn.execute(
+                "SELECT key, position, list_hash, slug FROM projects"
+            )
+        }
+        upserts = []
+        moves = []
+        wanted: Set[str] = set()
+        position = 0
+        for project in projects:
+            if not isinstance(project, dict):
+                continue
+            key = list_key(project)
+            if key is None or key in wanted:
+                continue
+            wanted.add(key)
+            serialized = dumps_compact(project)
+            list_hash = content_hash(serialized)
+            current = existing.get(key)
+            if current is None or current[1] != list_hash:
+                project_id = project.get("id")
+                slug = project.get("slug")
+                upserts.append(
+                    (
+                        key,
+                        project_id if isinstance(project_id, int) else None,
+                        slug if isinstance(slug, str) else None,
+                        position,
+                        serialized,
+                        list_hash,
+                    )
+                )
+            elif current[0] != position:
+                moves.append((position, key))
+            position += 1
+        removed = [(key,) for key in existing if key not in wanted]
+
+        if not (upserts or moves or removed):
+            return 0
+        previous = self._fetch_column("projects", "list_json", [row[0] for row in upserts])
+        with self.conn:
+            for key, _, slug, _, serialized, _ in upserts:
+                if key in previous:
+                    paths = diff_paths(json.loads(previous[key]), json.loads(serialized))
+                    self._note_change(key, "updated", paths, slug)
+                else:
+                    self._note_change(key, "added", [], slug)
+            for (key,) in removed:
+                self._note_change(key, "removed", [], existing[key][2])
+            self.conn.executemany(
+                "INSERT INTO projects (key, id, slug, position, list_json, list_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                "id = excluded.id, slug = excluded.slug, position = excluded.position, "
+                "list_json = excluded.list_json, list_hash = excluded.list_hash",
+                upserts,
+            )
+            self.conn.executemany("UPDATE projects SET position = ? WHERE key = ?", moves)
+            self.conn.executemany("DELETE FROM projects WHERE key = ?", removed)
+            self._bump_version()
+        return len(upserts) + len(moves) + len(removed)
+
+    def _fetch_column(self, table: str, column: str, keys: List[str]) -> Dict[str, str]:
+        """Current ``column`` values of ``keys`` in ``table``, in chunks under SQLite's variable limit."""
+        found: Dict[str, str] = {}
+        for start in range(0, len(keys), IMPORT_BATCH_SIZE):
+            chunk = keys[start : start + IMPORT_BATCH_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                self.conn.execute(
+                    f"SELECT key, {column} FROM {table} WHERE key IN ({placeholders})", chunk
+                )
+            )
+        return found
+
+    def list_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+
+    # -- details ------------------------------------------------------------
+
+    def upsert_details(self, details: Iterable[Dict[str, Any]]) -> int:
+        """Insert or replace details; unchanged records are not rewritten."""
+        changed = 0
+        batch: List[Tuple[Any, ...]] = []
+
+        def flush() -> None:
+            nonlocal changed
+            if not batch:
+                return
+            # Hashes decide what changed; only those rows are diffed and written
+            keys = [row[0] for row in batch]
+            previous_hashes = self._fetch_column("details", "detail_hash", keys)
+            changed_keys = [row[0] for row in batch if previous_hashes.get(row[0]) != row[4]]
+            previous = self._fetch_column(
+                "details", "detail_json", [key for key in changed_keys if key in previous_hashes]
+            )
+            rows = []
+            for row in batch:
+                key, _, slug, serialized, detail_hash, _ = row
+                if previous_hashes.get(key) == detail_hash:
+                    continue
+                old_json = previous.get(key)
+                if old_json is None:
+                    paths = ["details"]
+                else:
+                    paths = diff_paths(json.loads(old_json), json.loads(serialized), "details")
+                self._note_change(key, "updated", paths, slug)
+                # Later duplicates of the key in this batch compare against this row
+                previous_hashes[key] = detail_hash
+                previous[key] = serialized
+                rows.append(row)
+            self.conn.executemany(
+                "INSERT INTO details (key, fk_project_id, slug, detail_json, detail_hash, status) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                "fk_project_id = excluded.fk_project_id, slug = excluded.slug, "
+                "detail_json = excluded.detail_json, detail_hash = excluded.detail_hash, "
+                "status = excluded.status",
+                rows,
+            )
+            changed += len(rows)
+            batch.clear()
+
+        with self.conn:
+            for detail in details:
+                if not isinstance(detail, dict):
+                    continue
+                key = detail_key(detail)
+                if key is None:
+                    continue
+                serialized = dumps_compact(detail)
+                fk_project_id = detail.get("fk_project_id")
+                slug = detail.get("slug")
+                status = detail.get("project_status")
+                batch.append(
+                    (
+                        key,
+                        fk_project_id if isinstance(fk_project_id, int) else None,
+                        slug if isinstance(slug, str) else None,
+                        serialized,
+                        content_hash(serialized),
+                        status if isinstance(status, str) else None,
+                    )
+                )
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    flush()
+            flush()
+            if changed:
+                self._bump_version()
+        return changed
+
+    def import_jsonl(self, path: Path) -> int:
+        """Load lines appended to ``path`` since the last import; returns records changed."""
+        if not path.is_file():
+            return 0
+        offset = int(self.get_meta(f"jsonl_offset:{path.name}", "0") or 0)
+        size = path.stat().st_size
+        if size < offset:
+            # The log was truncated (force refresh); read it again from the start
+            offset = 0
+
+        consumed = offset
+
+        def records(handle: Any) -> Iterator[Dict[str, Any]]:
+            nonlocal consumed
+            for raw_line in handle:
+                if not raw_line.endswith(b"\n"):
+                    # A partial last line is picked up by the next import
+                    break
+                consumed += len(raw_line)
+                raw_line = raw_line.strip()
+                if not raw_line:
+                    continue
+                try:
+                    record = json.loads(raw_line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict):
+                    yield record
+
+        with path.open("rb") as handle:
+            handle.seek(offset)
+            changed = self.upsert_details(records(handle))
+        with self.conn:
+            self.set_meta(f"jsonl_offset:{path.name}", consumed)
+            # Details logged before fetch times were tracked are at most as old as the log
+            self.conn.execute(
+                "INSERT OR IGNORE INTO freshness (key, fetched_at, detail_hash) "
+                "SELECT key, ?, detail_hash FROM details",
+                (path.stat().st_mtime,),
+            )
+        return changed
+
+    def compact_jsonl(self, path: Path, ratio: float = JSONL_COMPACT_RATIO) -> bool:
+        """Rewrite ``path`` with one line per stored detail if it outgrew them ``ratio`` times.
+
+        Only a fully imported log is compacted, so no appended line is lost.
+        """
+        if not path.is_file():
+            return False
+        size = path.stat().st_size
+        if int(self.get_meta(f"jsonl_offset:{path.name}", "0") or 0) != size:
+            return False
+        # detail_json is ASCII, so its length is its size in bytes
+        live = self.conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(detail_json) + 1), 0) FROM details"
+        ).fetchone()[0]
+        if size <= live * ratio:
+            return False
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            for (detail_json,) in self.conn.execute("SELECT detail_json FROM details ORDER BY rowid"):
+                handle.write(detail_json + "\n")
+        os.replace(tmp_path, path)
+        with self.conn:
+            self.set_meta(f"jsonl_offset:{path.name}", path.stat().st_size)
+        return True
+
+    def reset_jsonl_offset(self, path: Path) -> None:
+        """Forget the import position of ``path``; call when truncating it."""
+        with self.conn:
+            self.set_meta(f"jsonl_offset:{path.name}", 0)
+
+    def detail_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM details").fetchone()[0]
+
+    # -- freshness ----------------------------------------------------------
+
+    def record_fetch(self, key: str, result: Dict[str, Any]) -> bool:
+        """Remember when ``key`` was fetched and what came back.
+
+        Returns True if the result differs from the previous fetch of the project.
+        """
+        result_hash = content_hash(dumps_compact(result))
+        row = self.conn.execute(
+            "SELECT detail_hash FROM freshness WHERE key = ?", (key,)
+        ).fetchone()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO freshness (key, fetched_at, list_hash, detail_hash) "
+                "VALUES (?, ?, (SELECT list_hash FROM projects WHERE key = ?), ?) "
+                "ON CONFLICT(key) DO UPDATE SET fetched_at = excluded.fetched_at, "
+                "list_hash = excluded.list_hash, detail_hash = excluded.detail_hash",
+                (key, time.time(), key, result_hash),
+            )
+        return row is None or row[0] != result_hash
+
+    def plan_detail_refresh(
+        self,
+        budget: int = 0,
+        max_age_hours: float = 0.0,
+        max_age_by_status: Optional[Dict[str, float]] = None,
+        refresh_before: Optional[float] = None,
+        now: Optional[float] = None,
+    ) -> DetailRefreshPlan:
+        """Pick which details to fetch, spending ``budget`` requests (0 = unlimited).
+
+        Priority: projects with no detail and no previous attempt, then projects
+        whose list entry changed since their detail was fetched, then the oldest
+        fetches past their max age. The max age is looked up by ``project_status``
+        in ``max_age_by_status``, falling back to ``max_age_hours`` (0 = never
+        stale). ``refresh_before`` marks everything fetched before that time as
+        stale regardless of age. Failed fetches are retried after a day.
+        """
+        now = time.time() if now is None else now
+        max_age_by_status = max_age_by_status or {}
+        missing: List[Tuple[Optional[str], Optional[int]]] = []
+        changed: List[Tuple[Optional[str], Optional[int]]] = []
+        stale: List[Tuple[float, Optional[str], Optional[int]]] = []
+        rows = self.conn.execute(
+            "SELECT p.id, p.slug, p.list_hash, f.fetched_at, f.list_hash, d.status, "
+            "d.key IS NOT NULL OR (p.id IS NULL AND EXISTS ("
+            "  SELECT 1 FROM details s WHERE s.slug = p.slug"
+            ")) "
+            "FROM projects p "
+            "LEFT JOIN details d ON d.key = p.key "
+            "LEFT JOIN freshness f ON f.key = p.key "
+            "ORDER BY p.position"
+        )
+        for project_id, slug, list_hash, fetched_at, fetched_list_hash, status, has_detail in rows:
+            job = (slug, project_id)
+            if fetched_at is None:
+                if not has_detail:
+                    missing.append(job)
+                continue
+            if fetched_list_hash is not None and fetched_list_hash != list_hash:
+                changed.append(job)
+                continue
+            if refresh_before is not None:
+                if fetched_at < refresh_before:
+                    stale.append((fetched_at, slug, project_id))
+                continue
+            max_age = max_age_by_status.get(status or "", max_age_hours)
+            if not has_detail:
+                max_age = min(max_age, FAILED_RETRY_HOURS) if max_age > 0 else FAILED_RETRY_HOURS
+            if max_age > 0 and now - fetched_at >= max_age * 3600:
+                stale.append((fetched_at, slug, project_id))
+
+        stale.sort(key=lambda entry: entry[0])
+        ordered = missing + changed + [(slug, project_id) for _, slug, project_id in stale]
+        limit = budget if budget > 0 else len(ordered)
+        selected = ordered[:limit]
+        plan = DetailRefreshPlan(jobs=selected, deferred=len(ordered) - len(selected))
+        plan.missing = min(len(missing), limit)
+        plan.changed = min(len(changed), max(limit - len(missing), 0))
+        plan.stale = len(selected) - plan.missing - plan.changed
+        return plan
+
+    def get_detail(
+        self, project_id: Optional[int] = None, slug: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        row = None
+        if project_id is not None:
+            row = self.conn.execute(
+                "SELECT detail_json FROM details WHERE key = ?", (str(project_id),)
+            ).fetchone()
+        if row is None and slug:
+            row = self.conn.execute(
+                "SELECT detail_json FROM details WHERE slug = ? ORDER BY rowid DESC LIMIT 1",
+                (slug,),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # -- changelog ----------------------------------------------------------
+
+    def flush_changelog(
+        self, run_id: str, jsonl_path: Optional[Path] = None
+    ) -> List[Dict[str, Any]]:
+        """Move the pending changes to the changelog and return them.
+
+        Each entry gets a monotonically increasing ``seq`` that consumers keep as
+        their cursor. Entries are also appended to ``jsonl_path`` when given,
+        including any committed by an earlier run that stopped before appending.
+        """
+        pending = self.conn.execute(
+            "SELECT key, change, paths, slug FROM pending_changes ORDER BY rowid"
+        ).fetchall()
+        keys = [row[0] for row in pending]
+        list_hashes = self._fetch_column("projects", "list_hash", keys)
+        detail_hashes = self._fetch_column("details", "detail_hash", keys)
+        recorded_at = time.time()
+        first_seq = None
+        with self.conn:
+            for key, change, paths, slug in pending:
+                record_hash = None
+                if change != "removed":
+                    record_hash = content_hash(
+                        f"{list_hashes.get(key, '')}:{detail_hashes.get(key, '')}"
+                    )
+                cursor = self.conn.execute(
+                    "INSERT INTO changelog "
+                    "(run_id, key, id, slug, change, paths, record_hash, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id,
+                        key,
+                        int(key) if key.isdigit() else None,
+                        slug,
+                        change,
+                        json.dumps(json.loads(paths)[:MAX_CHANGE_PATHS]),
+                        record_hash,
+                        recorded_at,
+                    ),
+                )
+                if first_seq is None:
+                    first_seq = cursor.lastrowid
+            self.conn.execute("DELETE FROM pending_changes")
+        entries = self.changes_since(first_seq - 1, len(pending)) if pending else []
+        if jsonl_path is not None:
+            self._append_changes_jsonl(jsonl_path)
+        return entries
+
+    def _append_changes_jsonl(self, path: Path) -> None:
+        """Append changelog entries newer than the last line of the JSONL copy."""
+        last = last_jsonl_seq(path)
+        with path.open("a", encoding="utf-8") as handle:
+            if handle.tell() and not _ends_with_newline(path):
+                # Close off a line cut short by an interrupted append
+                handle.write("\n")
+            while True:
+                entries = self.changes_since(last, IMPORT_BATCH_SIZE)
+                if not entries:
+                    break
+                for entry in entries:
+                    handle.write(json.dumps(entry, ensure_ascii=True) + "\n")
+                last = entries[-1]["seq"]
+
+    def changes_since(self, cursor: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Changelog entries with ``seq`` greater than ``cursor``, oldest first."""
+        rows = self.conn.execute(
+            "SELECT seq, run_id, id, slug, change, paths, record_hash, recorded_at "
+            "FROM changelog WHERE seq > ? ORDER BY seq LIMIT ?",
+            (cursor, limit),
+        )
+        return [
+            {
+                "seq": seq,
+                "run_id": run_id,
+                "change": change,
+                "id": project_id,
+                "slug": slug,
+                "paths": json.loads(paths),
+                "hash": record_hash,
+                "recorded_at": time.strftime(
+                    "%Y-%m-%dT%H:%M:%S%z", time.localtime(recorded_at)
+                ),
+            }
+            for seq, run_id, project_id, slug, change, paths, record_hash, recorded_at in rows
+        ]
+
+    # -- views --------------------------------------------------------------
+
+    def iter_details(self) -> Iterator[Dict[str, Any]]:
+        for (detail_json,) in self.conn.execute("SELECT detail_json FROM details ORDER BY rowid"):
+            yield json.loads(detail_json)
+
+    def iter_list(self) -> Iterator[Dict[str, Any]]:
+        for (list_json,) in self.conn.execute("SELECT list_json FROM projects ORDER BY position"):
+            yield json.loads(list_json)
+
+    def _merged_rows(self) -> Iterator[Tuple[Optional[int], str, Optional[str]]]:
+        return self.conn.execute(
+            "SELECT p.id, p.list_json, COALESCE(d.detail_json, ("
+            "  SELECT s.detail_json FROM details s WHERE s.slug = p.slug "
+            "  ORDER BY s.rowid DESC LIMIT 1"
+            ")) FROM projects p LEFT JOIN details d ON d.key = p.key "
+            "ORDER BY p.position"
+        )
+
+    def iter_merged(self) -> Iterator[Dict[str, Any]]:
+        """List entries in list order, with ``details`` attached when one is stored."""
+        for _, list_json, detail_json in self._merged_rows():
+            item = json.loads(list_json)
+            if detail_json is not None:
+                item["details"] = json.loads(detail_json)
+            yield item
+
+    def iter_details_by_fk(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(fk, detail) pairs: every detail by its fk, then list ids matched by slug."""
+        emitted: Set[int] = set()
+        for fk_project_id, detail_json in self.conn.execute(
+            "SELECT fk_project_id, detail_json FROM details "
+            "WHERE fk_project_id IS NOT NULL ORDER BY rowid"
+        ):
+            emitted.add(fk_project_id)
+            yield fk_project_id, json.loads(detail_json)
+        for project_id, _, detail_json in self._merged_rows():
+            if project_id is None or detail_json is None or project_id in emitted:
+                continue
+            emitted.add(project_id)
+            yield project_id, json.loads(detail_json)
+
+    def export_json(self, output_dir: Path, force: bool = False) -> bool:
+        """Write the legacy JSON outputs if the store changed since the last export."""
+        outputs = {
+            "details": output_dir / "projects_details.json",
+            "merged": output_dir / "projects_merged.json",
+            "by_fk": output_dir / "projects_details_by_fk.json",
+        }
+        version = self.data_version
+        exported = int(self.get_meta("exported_version", "-1") or -1)
+        if not force and exported == version and all(p.is_file() for p in outputs.values()):
+            return False
+
+        count = write_json_array(outputs["details"], self.iter_details())
+        print(f"Saved {count} project details to {outputs['details']}")
+        count = write_json_array(outputs["merged"], self.iter_merged())
+        print(f"Saved {count} merged projects to {outputs['merged']}")
+        count = write_json_object(outputs["by_fk"], self.iter_details_by_fk())
+        print(f"Saved {count} details by fk to {outputs['by_fk']}")
+        with self.conn:
+            self.set_meta("exported_version", version)
+        return True
+
+    def _fk_detail_keys(self) -> Iterator[Tuple[int, str]]:
+        """(fk, detail key) pairs in the same order as ``iter_details_by_fk``."""
+        emitted: Set[int] = set()
+        for fk_project_id, key in self.conn.execute(
+            "SELECT fk_project_id, key FROM details "
+            "WHERE fk_project_id IS NOT NULL ORDER BY rowid"
+        ):
+            emitted.add(fk_project_id)
+            yield fk_project_id, key
+        for project_id, key in self.conn.execute(
+            "SELECT p.id, COALESCE(d.key, ("
+            "  SELECT s.key FROM details s WHERE s.slug = p.slug "
+            "  ORDER BY s.rowid DESC LIMIT 1"
+            ")) FROM projects p LEFT JOIN details d ON d.key = p.key "
+            "ORDER BY p.position"
+        ):
+            if project_id is None or key is None or project_id in emitted:
+                continue
+            emitted.add(project_id)
+            yield project_id, key
+
+    def _sync_data_file(
+        self, path: Path, name: str, table: str, column: str, hash_column: str, order: str
+    ) -> Tuple[Dict[str, Span], FileStamp, int, Optional[Path]]:
+        """Bring an index data file up to date with ``table``.
+
+        Only new or changed records are appended. The file is rewritten when it
+        is missing, was replaced behind the store's back, or is mostly dead bytes;
+        a rewrite goes to a temp file, returned last, for the caller to move into
+        place just before the index. Also returns the spans, stamp and records written.
+        """
+        current = dict(self.conn.execute(f"SELECT key, {hash_column} FROM {table}"))
+        spans = {
+            key: (offset, length, written_hash)
+            for key, offset, length, written_hash in self.conn.execute(
+                "SELECT key, offset, length, hash FROM index_spans WHERE file = ?", (name,)
+            )
+        }
+        stamp = file_stamp(path)
+        recorded = self.get_meta(f"index_stamp:{name}")
+        recorded_stamp = tuple(int(part) for part in recorded.split(":")) if recorded else None
+        live = sum(spans[key][1] + 1 for key in current if key in spans)
+        rewrite = (
+            stamp is None
+            or recorded_stamp is None
+            or stamp[0] != recorded_stamp[0]
+            or stamp[1] < recorded_stamp[1]
+            or stamp[1] - live > max(live, INDEX_COMPACT_MIN_BYTES)
+        )
+        if rewrite:
+            keys = [key for (key,) in self.conn.execute(f"SELECT key FROM {table} ORDER BY {order}")]
+        else:
+            keys = [key for key, value in current.items() if spans.get(key, (0, 0, None))[2] != value]
+
+        titled: Dict[str, int] = {}
+
+        def records() -> Iterator[Tuple[str, str]]:
+            for start in range(0, len(keys), IMPORT_BATCH_SIZE):
+                chunk = keys[start : start + IMPORT_BATCH_SIZE]
+                texts = self._fetch_column(table, column, chunk)
+                for key in chunk:
+                    if name == "list":
+                        titled[key] = 1 if json.loads(texts[key]).get("title") else 0
+                    yield key, texts[key]
+
+        # The inode and size of the temp file carry over when it is moved into place
+        target = path.with_name(path.name + ".tmp") if rewrite else path
+        written = write_records(target, records(), append=not rewrite)
+        stamp = file_stamp(target) or (0, 0)
+        with self.conn:
+            if rewrite:
+                self.conn.execute("DELETE FROM index_spans WHERE file = ?", (name,))
+            else:
+                self.conn.executemany(
+                    "DELETE FROM index_spans WHERE file = ? AND key = ?",
+                    [(name, key) for key in spans if key not in current],
+                )
+            self.conn.executemany(
+                "INSERT INTO index_spans (file, key, offset, length, hash, titled) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(file, key) DO UPDATE SET "
+                "offset = excluded.offset, length = excluded.length, "
+                "hash = excluded.hash, titled = excluded.titled",
+                [
+                    (name, key, offset, length, current[key], titled.get(key, 0))
+                    for key, (offset, length) in written.items()
+                ],
+            )
+            self.set_meta(f"index_stamp:{name}", f"{stamp[0]}:{stamp[1]}")
+        result = {key: (offset, length) for key, (offset, length, _) in spans.items() if key in current}
+        result.update(written)
+        return result, stamp, len(written), target if rewrite else None
+
+    def _index_readable(self, output_dir: Path, version: int) -> bool:
+        """Whether readers can open the index in ``output_dir`` and it is for ``version``.
+
+        The data files can be replaced without the store changing (a copied
+        ``dist/``, a restored backup), which leaves the index unusable until rebuilt.
+        """
+        index = OffsetIndex.open(output_dir)
+        if index is None:
+            return False
+        with index:
+            return index.counts.data_version == version
+
+    def export_index(self, output_dir: Path, force: bool = False) -> bool:
+        """Update the offset index and its data files if the store changed since the last one.
+
+        Changed records are appended to ``projects_list.jsonl`` and
+        ``projects_details_by_fk.jsonl``, so the bytes written grow with the
+        number of changed projects; only the small index file is rewritten.
+        """
+        version = self.data_version
+        indexed = int(self.get_meta("indexed_version", "-1") or -1)
+        if not force and indexed == version and self._index_readable(output_dir, version):
+            return False
+
+        if force:
+            with self.conn:
+                self.conn.execute("DELETE FROM meta WHERE name LIKE 'index_stamp:%'")
+        list_spans, list_stamp, list_written, list_rewrite = self._sync_data_file(
+            output_dir / LIST_DATA_FILENAME, "list", "projects", "list_json", "list_hash", "position"
+        )
+        detail_spans, details_stamp, details_written, details_rewrite = self._sync_data_file(
+            output_dir / DETAILS_DATA_FILENAME, "details", "details", "detail_json", "detail_hash", "rowid"
+        )
+        positions = [
+            list_spans[key] for (key,) in self.conn.execute("SELECT key FROM projects ORDER BY position")
+        ]
+        titled = self.conn.execute(
+            "SELECT COALESCE(SUM(titled), 0) FROM index_spans WHERE file = 'list'"
+        ).fetchone()[0]
+        slugs = dict(self.conn.execute("SELECT key, slug FROM details WHERE slug IS NOT NULL"))
+        by_id = []
+        by_slug: Dict[int, Span] = {}
+        for fk_project_id, key in self._fk_detail_keys():
+            span = detail_spans[key]
+            by_id.append((fk_project_id, *span))
+            # The first detail for a slug wins, as in iter_details_by_fk
+            if key in slugs:
+                by_slug.setdefault(slug_hash(slugs[key]), span)
+        # Readers reject the old index once a rewritten file replaces its data
+        # file, so the rewrites are moved into place only now, next to the index
+        for rewritten in (list_rewrite, details_rewrite):
+            if rewritten is not None:
+                os.replace(rewritten, rewritten.with_suffix(""))
+        write_index(
+            output_dir, positions, by_id, by_slug, titled, version, list_stamp, details_stamp
+        )
+        print(
+            f"Indexed {len(positions)} list entries and {len(by_id)} details in "
+            f"{output_dir / INDEX_FILENAME} ({list_written + details_written} records written)"
+        )
+        with self.conn:
+            self.set_meta("indexed_version", version)
+        return True
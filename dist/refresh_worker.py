@@ -0,0 +1,320 @@
+"""Long-running refresh worker for the scraper.
+
+Keeps the Remapp token, the project store and the parsed list in memory and
+runs refresh jobs one at a time on a single thread, so a refresh only pays for
+the network work. Jobs are submitted over local HTTP:
+
+    POST /jobs            {"mode": "incremental" | "full"}   (?wait=1 blocks until done)
+    GET  /jobs/<id>       job status and progress            (?wait=1 blocks until done)
+    GET  /status          running, queued and last job
+
+Requests are coalesced: one arriving before the running job has started its
+list sync joins that job if its mode is covered (a full job covers an
+incremental request), and otherwise joins the single queued job, which is
+upgraded to full if any of its requests asked for full. A burst of triggers
+therefore costs at most two runs.
+
+Usage:
+    python dist/refresh_worker.py --port 8787
+"""
+
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from fetch_public_projects import (
+    ENV_PATH,
+    METRICS_JSON_PATH,
+    METRICS_PROM_PATH,
+    ScraperSession,
+    load_env_file,
+    run_with_metrics,
+)
+from run_metrics import RunMetrics
+
+
+DEFAULT_PORT = 8787
+JOB_MODES = ("incremental", "full")
+# A request may join the running job until that job starts reading the list
+JOINABLE_PHASES = {"lock_wait", "login"}
+MAX_JOB_HISTORY = 100
+MAX_OUTPUT_CHARS = 64 * 1024
+
+
+@dataclass
+class RefreshJob:
+    id: int
+    mode: str
+    status: str = "queued"
+    requests: int = 1
+    queued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    output: str = ""
+    metrics: Optional[RunMetrics] = field(default=None, repr=False)
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def covers(self, mode: str) -> bool:
+        return self.mode == "full" or mode == "incremental"
+
+    def joinable(self, mode: str) -> bool:
+        """Whether a request for ``mode`` arriving now would get the same result from this run."""
+        if self.status != "running" or self.metrics is None or not self.covers(mode):
+            return False
+        phase = self.metrics.phase
+        # Phase None with no phases recorded means the run has not started yet;
+        # after finish() it is None again, but by then the phases are recorded
+        return phase in JOINABLE_PHASES or (phase is None and not self.metrics.phases)
+
+    def to_dict(self, include_output: bool = False) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "id": self.id,
+            "mode": self.mode,
+            "status": self.status,
+            "requests": self.requests,
+            "queued_at": _timestamp(self.queued_at),
+            "started_at": _timestamp(self.started_at),
+            "finished_at": _timestamp(self.finished_at),
+            "error": self.error,
+        }
+        if self.metrics is not None:
+            snapshot = self.metrics.snapshot()
+            counters = snapshot["counters"]
+            data["progress"] = {
+                "phase": snapshot["phase"],
+                "list_mode": snapshot["mode"],
+                "details_planned": counters.get("details_planned", 0),
+                "details_fetched": counters.get("projects_fetched", 0),
+                "duration_seconds": snapshot["duration_seconds"],
+            }
+        if include_output:
+            data["output"] = self.output
+        return data
+
+
+class _JobOutput(io.TextIOBase):
+    """Copies what a job prints to the worker's stdout and keeps the tail for the job."""
+
+    def __init__(self, job: RefreshJob, stream: Any) -> None:
+        self.job = job
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        self.stream.write(text)
+        self.job.output = (self.job.output + text)[-MAX_OUTPUT_CHARS:]
+        return len(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+class RefreshWorker:
+    """Queue of refresh jobs, run one at a time by ``run_forever`` on its own thread."""
+
+    def __init__(self) -> None:
+        self.session = ScraperSession()
+        self.jobs: "OrderedDict[int, RefreshJob]" = OrderedDict()
+        self.running: Optional[RefreshJob] = None
+        self.pending: Optional[RefreshJob] = None
+        self.last: Optional[RefreshJob] = None
+        self.started_at = time.time()
+        self._next_id = 1
+        self._stopping = False
+        self._cond = threading.Condition()
+
+    def submit(self, mode: str) -> Tuple[RefreshJob, bool]:
+        """Queue a refresh; return the job that will serve it and whether it was coalesced."""
+        with self._cond:
+            running = self.running
+            if running is not None and running.joinable(mode):
+                running.requests += 1
+                return running, True
+            if self.pending is not None:
+                if mode == "full":
+                    self.pending.mode = "full"
+                self.pending.requests += 1
+                return self.pending, True
+            job = RefreshJob(id=self._next_id, mode=mode)
+            self._next_id += 1
+            self.pending = job
+            self.jobs[job.id] = job
+            while len(self.jobs) > MAX_JOB_HISTORY:
+                self.jobs.popitem(last=False)
+            self._cond.notify_all()
+            return job, False
+
+    def get(self, job_id: int) -> Optional[RefreshJob]:
+        with self._cond:
+            return self.jobs.get(job_id)
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            running, pending, last = self.running, self.pending, self.last
+        client = self.session.client
+        return {
+            "started_at": _timestamp(self.started_at),
+            "running": running.to_dict() if running else None,
+            "pending": pending.to_dict() if pending else None,
+            "last": last.to_dict() if last else None,
+            "has_token": bool(client and client.tokens.token),
+        }
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    def run_forever(self) -> None:
+        try:
+            while True:
+                with self._cond:
+                    while self.pending is None and not self._stopping:
+                        self._cond.wait()
+                    if self._stopping:
+                        if self.pending is not None:
+                            self.pending.status = "cancelled"
+                            self.pending.done.set()
+                        return
+                    job = self.pending
+                    self.pending = None
+                    job.metrics = RunMetrics(METRICS_JSON_PATH, METRICS_PROM_PATH)
+                    job.status = "running"
+                    job.started_at = time.time()
+                    self.running = job
+                try:
+                    self._run(job)
+                finally:
+                    with self._cond:
+                        if job.status == "running":
+                            job.status = "failed"
+                        self.running = None
+                        self.last = job
+                    job.done.set()
+        finally:
+            self.session.close()
+
+    def _run(self, job: RefreshJob) -> None:
+        stdout = sys.stdout
+        sys.stdout = _JobOutput(job, stdout)
+        try:
+            print(f"Refresh job {job.id} ({job.mode}) started")
+            run_with_metrics(job.metrics, self.session, incremental=job.mode == "incremental")
+            job.status = "completed"
+        except (Exception, SystemExit) as exc:
+            # The scraper exits with SystemExit on unrecoverable errors (e.g. auth);
+            # the store may have been left mid-write, so reopen it for the next job
+            self.session.close()
+            job.status = "failed"
+            job.error = f"{type(exc).__name__}: {exc}"
+            print(f"Refresh job {job.id} failed: {job.error}")
+        finally:
+            job.finished_at = time.time()
+            sys.stdout = stdout
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(value))
+
+
+def make_server(worker: RefreshWorker, host: str, port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/status":
+                self._send(200, worker.status())
+                return
+            if url.path.startswith("/jobs/"):
+                try:
+                    job = worker.get(int(url.path[len("/jobs/"):]))
+                except ValueError:
+                    job = None
+                if job is None:
+                    self._send(404, {"error": "Unknown job"})
+                    return
+                self._send_job(job, _flag(query, "wait"))
+                return
+            self._send(404, {"error": "Not found"})
+
+        def do_POST(self) -> None:
+            url = urlparse(self.path)
+            if url.path != "/jobs":
+                self._send(404, {"error": "Not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                body = None
+            if not isinstance(body, dict) or body.get("mode", "incremental") not in JOB_MODES:
+                self._send(400, {"error": f"mode must be one of: {', '.join(JOB_MODES)}"})
+                return
+            job, coalesced = worker.submit(body.get("mode", "incremental"))
+            self._send_job(job, _flag(parse_qs(url.query), "wait"), coalesced=coalesced)
+
+        def _send_job(self, job: RefreshJob, wait: bool, coalesced: Optional[bool] = None) -> None:
+            if wait:
+                job.done.wait()
+            payload = job.to_dict(include_output=job.done.is_set())
+            if coalesced is not None:
+                payload["coalesced"] = coalesced
+            self._send(200 if job.done.is_set() else 202, payload)
+
+        def _send(self, status: int, payload: Any) -> None:
+            data = json.dumps(payload, ensure_ascii=True).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def _flag(query: Dict[str, Any], name: str) -> bool:
+    return query.get(name, ["0"])[-1].strip().lower() in {"1", "true", "yes"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    load_env_file(ENV_PATH)
+    worker = RefreshWorker()
+    thread = threading.Thread(target=worker.run_forever, name="refresh-worker")
+    thread.start()
+    httpd = make_server(worker, args.host, args.port)
+    print(f"Refresh worker listening on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        # A job already running is finished before exiting
+        worker.stop()
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
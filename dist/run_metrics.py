@@ -0,0 +1,280 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = "remapp_scraper"
+COUNTER_HELP = {
+    "retries": "Detail requests retried after a 429 or a failed re-login.",
+    "throttled": "Responses with status 429.",
+    "relogins": "Token refreshes (logins) during the run.",
+    "relogin_failures": "Token refreshes whose login request failed.",
+    "bytes_downloaded": "Response bytes received.",
+    "projects_fetched": "Project details fetched.",
+    "details_missing": "Detail fetches that returned no data.",
+    "details_planned": "Detail fetches scheduled by the refresh plan.",
+}
+
+
+def write_atomic(path: Path, text: str) -> None:
+    # Unique per process and thread, so concurrent writers never share a temp file
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                break
+
+    def cumulative(self) -> List[int]:
+        running = 0
+        counts = []
+        for bucket in self.buckets:
+            running += bucket
+            counts.append(running)
+        return counts
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if it is past the last bound)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, running in zip(LATENCY_BUCKETS, self.cumulative()):
+            if running >= target:
+                return bound
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.total, 6),
+            "avg_seconds": round(self.total / self.count, 6) if self.count else None,
+            "max_seconds": round(self.max, 6),
+            "p50_le_seconds": self.quantile(0.5),
+            "p95_le_seconds": self.quantile(0.95),
+            "buckets": {
+                str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.cumulative())
+            },
+        }
+
+
+class RunMetrics:
+    """Phase timings, request latency histograms and counters for one scraper run.
+
+    Snapshots are written atomically as JSON and Prometheus text, periodically
+    while the run is going and once more when it finishes.
+    """
+
+    def __init__(self, json_path: Optional[Path] = None, prom_path: Optional[Path] = None) -> None:
+        self.json_path = json_path
+        self.prom_path = prom_path
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.status = "running"
+        self.mode: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {name: 0 for name in COUNTER_HELP}
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.responses: Dict[str, Dict[str, int]] = {}
+        self._phase: Optional[str] = None
+        self._phase_started = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def phase(self) -> Optional[str]:
+        return self._phase
+
+    # -- recording ----------------------------------------------------------
+
+    def enter_phase(self, name: Optional[str]) -> None:
+        """Close the current phase and start timing ``name`` (None just closes)."""
+        now = time.perf_counter()
+        with self._lock:
+            if self._phase is not None:
+                self.phases[self._phase] = (
+                    self.phases.get(self._phase, 0.0) + now - self._phase_started
+                )
+            self._phase = name
+            self._phase_started = now
+            if name is not None:
+                self.phases.setdefault(name, 0.0)
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_request(
+        self, endpoint: str, seconds: float, status: Optional[int], size: int = 0
+    ) -> None:
+        status_label = str(status) if status is not None else "error"
+        with self._lock:
+            self.latency.setdefault(endpoint, LatencyHistogram()).observe(seconds)
+            by_status = self.responses.setdefault(endpoint, {})
+            by_status[status_label] = by_status.get(status_label, 0) + 1
+            self.counters["bytes_downloaded"] += size
+            if status == 429:
+                self.counters["throttled"] += 1
+
+    # -- reporting ----------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self.finished_at or time.time()
+            duration = now - self.started_at
+            fetch_seconds = self.phases.get("detail_fetch", 0.0)
+            fetched = self.counters.get("projects_fetched", 0)
+            return {
+                "status": self.status,
+                "mode": self.mode,
+                "phase": self._phase,
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_at)),
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(now)),
+                "duration_seconds": round(duration, 3),
+                "phases_seconds": {name: round(value, 3) for name, value in self.phases.items()},
+                "counters": dict(self.counters),
+                "projects_per_second": round(fetched / fetch_seconds, 3) if fetch_seconds else 0.0,
+                "requests": {
+                    endpoint: {
+                        "responses": dict(self.responses.get(endpoint, {})),
+                        "latency": histogram.to_dict(),
+                    }
+                    for endpoint, histogram in sorted(self.latency.items())
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        data = self.snapshot()
+        name = METRIC_PREFIX
+        lines = [
+            f"# HELP {name}_run_duration_seconds Wall time of the current or last run.",
+            f"# TYPE {name}_run_duration_seconds gauge",
+            f"{name}_run_duration_seconds {data['duration_seconds']}",
+            f"# HELP {name}_run_running Whether a run is in progress.",
+            f"# TYPE {name}_run_running gauge",
+            f"{name}_run_running {1 if data['status'] == 'running' else 0}",
+            f"# HELP {name}_run_success Whether the last finished run completed.",
+            f"# TYPE {name}_run_success gauge",
+            f"{name}_run_success {1 if data['status'] == 'completed' else 0}",
+            f"# HELP {name}_run_started_timestamp_seconds Start of the current or last run.",
+            f"# TYPE {name}_run_started_timestamp_seconds gauge",
+            f"{name}_run_started_timestamp_seconds {self.started_at:.3f}",
+            f"# HELP {name}_phase_duration_seconds Time spent in each phase of the run.",
+            f"# TYPE {name}_phase_duration_seconds gauge",
+        ]
+        for phase, seconds in data["phases_seconds"].items():
+            lines.append(f'{name}_phase_duration_seconds{{phase="{phase}"}} {seconds}')
+        for counter, help_text in COUNTER_HELP.items():
+            lines.append(f"# HELP {name}_{counter}_total {help_text}")
+            lines.append(f"# TYPE {name}_{counter}_total counter")
+            lines.append(f"{name}_{counter}_total {data['counters'].get(counter, 0)}")
+        lines.extend(
+            [
+                f"# HELP {name}_projects_per_second Detail fetch throughput.",
+                f"# TYPE {name}_projects_per_second gauge",
+                f"{name}_projects_per_second {data['projects_per_second']}",
+                f"# HELP {name}_responses_total Responses by endpoint and status.",
+                f"# TYPE {name}_responses_total counter",
+            ]
+        )
+        for endpoint, entry in data["requests"].items():
+            for status, count in sorted(entry["responses"].items()):
+                lines.append(
+                    f'{name}_responses_total{{endpoint="{endpoint}",status="{status}"}} {count}'
+                )
+        lines.extend(
+            [
+                f"# HELP {name}_request_duration_seconds Request latency by endpoint.",
+                f"# TYPE {name}_request_duration_seconds histogram",
+            ]
+        )
+        for endpoint, entry in data["requests"].items():
+            latency = entry["latency"]
+            for bound, count in latency["buckets"].items():
+                lines.append(
+                    f'{name}_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'{name}_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} '
+                f"{latency['count']}"
+            )
+            lines.append(
+                f'{name}_request_duration_seconds_sum{{endpoint="{endpoint}"}} {latency["sum_seconds"]}'
+            )
+            lines.append(
+                f'{name}_request_duration_seconds_count{{endpoint="{endpoint}"}} {latency["count"]}'
+            )
+        return "\n".join(lines) + "\n"
+
+    def request_summary(self) -> str:
+        data = self.snapshot()
+        parts = []
+        for endpoint, entry in data["requests"].items():
+            latency = entry["latency"]
+            errors = sum(
+                count
+                for status, count in entry["responses"].items()
+                if not status.isdigit() or int(status) >= 400
+            )
+            parts.append(
+                f"{endpoint}: {latency['count']} requests, {errors} errors, "
+                f"avg {(latency['avg_seconds'] or 0) * 1000:.0f} ms, "
+                f"max {latency['max_seconds'] * 1000:.0f} ms"
+            )
+        return "; ".join(parts)
+
+    def write(self) -> None:
+        if self.json_path is not None:
+            write_atomic(self.json_path, json.dumps(self.snapshot(), ensure_ascii=True, indent=2))
+        if self.prom_path is not None:
+            write_atomic(self.prom_path, self.to_prometheus())
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def start_periodic(self, interval: float) -> None:
+        """Write a snapshot every ``interval`` seconds until ``finish`` is called."""
+        self.write()
+        if interval <= 0:
+            return
+
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.write()
+                except OSError as exc:
+                    print(f"Could not write run metrics: {exc}")
+
+        self._thread = threading.Thread(target=loop, name="run-metrics", daemon=True)
+        self._thread.start()
+
+    def finish(self, status: str) -> None:
+        self.enter_phase(None)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            self.status = status
+            self.finished_at = time.time()
+        try:
+            self.write()
+        except OSError as exc:
+            print(f"Could not write run metrics: {exc}")
@@ -0,0 +1,245 @@
+"""End-to-end scraper benchmark against the local mock Remapp API.
+
+Runs ``fetch_public_projects.main`` once per mode (full, rehydrate-only, force
+refresh, batch, incremental) in a fresh subprocess pointed at
+``scripts/mock_remapp_api.py`` and reports wall time, requests/sec, retries
+and peak RSS. Each mode gets its own output directory; modes that need
+existing data start from a copy of the full run's output.
+
+Usage:
+    python scripts/benchmark_scraper.py --catalogue-size 300 --workers 8
+    python scripts/benchmark_scraper.py --modes full,incremental --json bench.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from mock_remapp_api import DEFAULT_FIXTURE, MockRemappServer
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+SCRAPER_DIR = ROOT_DIR / "dist"
+RESULT_MARKER = "__BENCHMARK_RESULT__ "
+MODES = ("full", "rehydrate", "force", "batch", "incremental")
+MODE_ENV: Dict[str, Dict[str, str]] = {
+    "full": {"REMAPP_USE_LOCAL_LIST": "0", "REMAPP_INCREMENTAL_MODE": "0"},
+    "rehydrate": {"REMAPP_REHYDRATE_ONLY": "1", "REMAPP_INCREMENTAL_MODE": "0"},
+    "force": {"REMAPP_FORCE_DETAIL_REFRESH": "1", "REMAPP_INCREMENTAL_MODE": "0"},
+    "batch": {"REMAPP_INCREMENTAL_MODE": "0"},
+    "incremental": {"REMAPP_INCREMENTAL_MODE": "1", "REMAPP_FULL_SYNC_HOURS": "0"},
+}
+# Modes that start from the full run's output instead of an empty directory
+SEEDED_MODES = {"rehydrate", "force", "batch", "incremental"}
+
+
+def peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(output_dir: Path, base_url: str) -> None:
+    """Entry point of the benchmark subprocess: run the scraper against ``base_url``."""
+    sys.path.insert(0, str(SCRAPER_DIR))
+    import fetch_public_projects as scraper
+
+    scraper.LIST_URL = f"{base_url}/api/project/public/list"
+    scraper.DETAIL_URL = f"{base_url}/api/project/details"
+    scraper.LOGIN_URL = f"{base_url}/api/login"
+    scraper.OUTPUT_DIR = output_dir
+    for name, value in list(vars(scraper).items()):
+        if name.endswith("_PATH") and isinstance(value, Path):
+            setattr(scraper, name, output_dir / value.name)
+
+    started = time.perf_counter()
+    scraper.main()
+    wall = time.perf_counter() - started
+    print(RESULT_MARKER + json.dumps({"wall_seconds": wall, "peak_rss_mb": peak_rss_mb()}))
+
+
+def fetch_stats(base_url: str) -> Dict[str, int]:
+    with urllib.request.urlopen(f"{base_url}/__stats", timeout=10) as response:
+        return json.loads(response.read())
+
+
+def mutate(base_url: str, changes: Dict[str, int]) -> None:
+    request = urllib.request.Request(
+        f"{base_url}/__mutate",
+        data=json.dumps(changes).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    urllib.request.urlopen(request, timeout=10).close()
+
+
+def run_mode(
+    mode: str,
+    server: MockRemappServer,
+    output_dir: Path,
+    extra_env: Dict[str, str],
+    verbose: bool,
+) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env.update(extra_env)
+    env.update(MODE_ENV[mode])
+    server.reset_stats()
+    process = subprocess.run(
+        [sys.executable, __file__, "--child", str(output_dir), server.base_url],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if verbose:
+        sys.stdout.write(process.stdout)
+    if process.returncode != 0:
+        sys.stderr.write(process.stdout[-2000:] + process.stderr[-2000:])
+        raise SystemExit(f"Benchmark mode {mode!r} failed with exit code {process.returncode}")
+
+    child: Dict[str, Any] = {}
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            child = json.loads(line[len(RESULT_MARKER):])
+    stats = fetch_stats(server.base_url)
+    requests_made = stats["list"] + stats["detail"] + stats["login"]
+    wall = child.get("wall_seconds", 0.0)
+    return {
+        "mode": mode,
+        "wall_seconds": round(wall, 3),
+        "requests": requests_made,
+        "requests_per_second": round(requests_made / wall, 2) if wall else 0.0,
+        "detail_requests": stats["detail"],
+        "list_requests": stats["list"],
+        "logins": stats["login"],
+        "retries": stats["status_429"] + stats["status_401"],
+        "status_429": stats["status_429"],
+        "status_401": stats["status_401"],
+        "bytes_sent": stats["bytes_sent"],
+        "peak_rss_mb": round(child.get("peak_rss_mb", 0.0), 1),
+    }
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    columns = (
+        ("mode", "mode", "{}"),
+        ("wall s", "wall_seconds", "{:.2f}"),
+        ("requests", "requests", "{}"),
+        ("req/s", "requests_per_second", "{:.1f}"),
+        ("retries", "retries", "{}"),
+        ("logins", "logins", "{}"),
+        ("peak RSS MB", "peak_rss_mb", "{:.1f}"),
+    )
+    rows = [[label for label, _, _ in columns]]
+    for result in results:
+        rows.append([fmt.format(result[key]) for _, key, fmt in columns])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    for row in rows:
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+
+
+def main() -> None:
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        run_child(Path(sys.argv[2]), sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated subset of: " + ", ".join(MODES))
+    parser.add_argument("--fixture", type=Path, default=DEFAULT_FIXTURE)
+    parser.add_argument("--catalogue-size", type=int, default=300)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--token-ttl", type=float, default=0.0)
+    parser.add_argument("--missing-ids", default="", help="comma-separated ids answered 404")
+    parser.add_argument("--invalid-ids", default="", help="comma-separated ids answered 422")
+    parser.add_argument("--workers", type=int, default=4, help="REMAPP_DETAIL_WORKERS for every mode")
+    parser.add_argument("--max-rate", type=float, default=50.0, help="REMAPP_DETAIL_MAX_RATE for every mode")
+    parser.add_argument("--batch-size", type=int, default=50, help="detail budget for the batch mode")
+    parser.add_argument("--incremental-changes", default="5,5", help="projects to add,update before the incremental mode")
+    parser.add_argument("--keep", type=Path, help="keep each mode's output under this directory")
+    parser.add_argument("--json", type=Path, help="also write the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="echo scraper output")
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)}")
+    # Seeded modes need the full run's output, so it always runs first
+    if any(mode in SEEDED_MODES for mode in modes) and "full" not in modes:
+        modes.insert(0, "full")
+    modes.sort(key=MODES.index)
+
+    server = MockRemappServer(
+        fixture=args.fixture,
+        catalogue_size=args.catalogue_size,
+        page_size=args.page_size,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        token_ttl=args.token_ttl,
+        missing_ids={int(i) for i in args.missing_ids.split(",") if i.strip()},
+        invalid_ids={int(i) for i in args.invalid_ids.split(",") if i.strip()},
+    ).start()
+    base_env = {
+        "REMAPP_USERNAME": "benchmark",
+        "REMAPP_PASSWORD": "benchmark",
+        "REMAPP_BEARER_TOKEN": "",
+        "REMAPP_DETAIL_WORKERS": str(args.workers),
+        "REMAPP_DETAIL_MAX_RATE": str(args.max_rate),
+    }
+    work_dir = Path(tempfile.mkdtemp(prefix="remapp-bench-"))
+    results: List[Dict[str, Any]] = []
+    try:
+        full_dir: Optional[Path] = None
+        for mode in modes:
+            output_dir = work_dir / mode
+            if mode in SEEDED_MODES and full_dir is not None:
+                shutil.copytree(full_dir, output_dir)
+            else:
+                output_dir.mkdir(parents=True)
+            extra_env = dict(base_env)
+            if mode == "batch":
+                extra_env["REMAPP_DETAIL_BUDGET"] = str(args.batch_size)
+                # Drop the copied details so the budget has work to spend
+                for name in (
+                    "projects_details.jsonl",
+                    "projects.sqlite3",
+                    "projects.sqlite3-wal",
+                    "projects.sqlite3-shm",
+                ):
+                    (output_dir / name).unlink(missing_ok=True)
+            if mode == "incremental":
+                added, updated = (int(part) for part in args.incremental_changes.split(","))
+                mutate(server.base_url, {"add": added, "update": updated})
+            print(f"Running {mode}...", flush=True)
+            results.append(run_mode(mode, server, output_dir, extra_env, args.verbose))
+            if mode == "full":
+                full_dir = output_dir
+        print()
+        print_report(results)
+        if args.json:
+            args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+            print(f"Saved results to {args.json}")
+    finally:
+        server.stop()
+        if args.keep:
+            shutil.copytree(work_dir, args.keep, dirs_exist_ok=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""Local stand-in for the Remapp list, detail and login endpoints.
+
+Serves a synthetic catalogue cloned from a captured detail response (by default
+``dist/og_project_2604.json``) so the scraper can be exercised without touching
+my.remapp.ae. Latency, page size, catalogue size, 429 rate, token lifetime,
+failing logins and 404/422 projects are configurable.
+
+Usage:
+    python scripts/mock_remapp_api.py --port 8765 --catalogue-size 500 --latency-ms 80
+
+Point the scraper at it by overriding ``LIST_URL``, ``DETAIL_URL`` and
+``LOGIN_URL`` (see ``scripts/benchmark_scraper.py``). ``GET /__stats`` returns
+request counters; ``POST /__mutate`` with ``{"add": n, "update": n, "remove": n}``
+changes the catalogue between runs.
+"""
+
+import argparse
+import copy
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_FIXTURE = ROOT_DIR / "dist" / "og_project_2604.json"
+LIST_FIELDS = (
+    "id",
+    "slug",
+    "title",
+    "types",
+    "project_status",
+    "price_start",
+    "price_end",
+    "currency",
+    "developer_name",
+    "project_location",
+    "created_at",
+)
+FIRST_PROJECT_ID = 1000
+
+
+class MockCatalogue:
+    """Synthetic projects built from a single fixture detail."""
+
+    def __init__(self, template: Dict[str, Any], size: int) -> None:
+        self.template = template
+        self.projects: List[Dict[str, Any]] = []
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self.by_slug: Dict[str, Dict[str, Any]] = {}
+        self.next_id = FIRST_PROJECT_ID
+        self.revision = 0
+        # Newest first, like the real list endpoint
+        for _ in range(size):
+            self.projects.insert(0, self._make_project())
+        self._reindex()
+
+    def _reindex(self) -> None:
+        self.by_id = {detail["id"]: detail for detail in self.projects}
+        self.by_slug = {detail["slug"]: detail for detail in self.projects}
+
+    def _make_project(self) -> Dict[str, Any]:
+        project_id = self.next_id
+        self.next_id += 1
+        detail = copy.deepcopy(self.template)
+        detail["id"] = project_id
+        detail["slug"] = f"mock-project-{project_id}"
+        detail["title"] = f"Mock Project {project_id}"
+        detail["created_at"] = time.strftime(
+            "%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime(1700000000 + project_id * 60)
+        )
+        return detail
+
+    def list_entry(self, detail: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: detail.get(key) for key in LIST_FIELDS}
+
+    def mutate(self, add: int = 0, update: int = 0, remove: int = 0) -> Dict[str, int]:
+        for _ in range(add):
+            self.projects.insert(0, self._make_project())
+        for detail in random.sample(self.projects, min(update, len(self.projects))):
+            self.revision += 1
+            detail["title"] = f"{detail['title']} (rev {self.revision})"
+            detail["price_start"] = str(100000 + self.revision)
+        for detail in random.sample(self.projects, min(remove, len(self.projects))):
+            self.projects.remove(detail)
+        self._reindex()
+        return {"added": add, "updated": update, "removed": remove, "total": len(self.projects)}
+
+    def find(self, project_id: Optional[int], slug: Optional[str]) -> Optional[Dict[str, Any]]:
+        if project_id is not None:
+            return self.by_id.get(project_id)
+        return self.by_slug.get(slug) if slug else None
+
+
+class MockRemappServer:
+    """Threaded HTTP server answering like the Remapp API, with knobs for load testing."""
+
+    def __init__(
+        self,
+        port: int = 0,
+        fixture: Path = DEFAULT_FIXTURE,
+        catalogue_size: int = 300,
+        page_size: int = 20,
+        latency_ms: float = 50.0,
+        jitter_ms: float = 20.0,
+        rate_429: float = 0.0,
+        retry_after: float = 1.0,
+        token_ttl: float = 0.0,
+        missing_ids: Optional[Set[int]] = None,
+        invalid_ids: Optional[Set[int]] = None,
+        list_requires_auth: bool = False,
+        failed_logins: int = 0,
+        seed: int = 0,
+    ) -> None:
+        random.seed(seed)
+        payload = json.loads(fixture.read_text(encoding="utf-8"))
+        template = payload.get("data", payload) if isinstance(payload, dict) else {}
+        self.catalogue = MockCatalogue(template, catalogue_size)
+        self.page_size = page_size
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.missing_ids = missing_ids or set()
+        self.invalid_ids = invalid_ids or set()
+        self.list_requires_auth = list_requires_auth
+        # The next this many logins answer 503, as during an auth outage
+        self.failed_logins = failed_logins
+        self.tokens: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {}
+        self.reset_stats()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.stats = {
+                "list": 0,
+                "detail": 0,
+                "login": 0,
+                "status_401": 0,
+                "status_404": 0,
+                "status_422": 0,
+                "status_429": 0,
+                "bytes_sent": 0,
+            }
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + amount
+
+    def start(self) -> "MockRemappServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def issue_token(self) -> str:
+        with self.lock:
+            token = f"mock-token-{len(self.tokens) + 1}"
+            self.tokens[token] = time.monotonic()
+            return token
+
+    def token_valid(self, header: Optional[str]) -> bool:
+        if not header or not header.startswith("Bearer "):
+            return False
+        issued = self.tokens.get(header[len("Bearer "):])
+        if issued is None:
+            return False
+        return self.token_ttl <= 0 or time.monotonic() - issued < self.token_ttl
+
+    def simulate_latency(self) -> None:
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    # -- endpoints ----------------------------------------------------------
+
+    def handle_list(self, body: Dict[str, Any], auth: Optional[str]) -> Tuple[int, Any]:
+        self.count("list")
+        if self.list_requires_auth and not self.token_valid(auth):
+            self.count("status_401")
+            return 401, {"message": "Unauthenticated."}
+        page = body.get("page") if isinstance(body.get("page"), int) else 1
+        projects = self.catalogue.projects
+        start = (max(page, 1) - 1) * self.page_size
+        entries = [
+            self.catalogue.list_entry(detail)
+            for detail in projects[start : start + self.page_size]
+        ]
+        return 200, {
+            "status": True,
+            "data": {
+                "current_page": page,
+                "data": entries,
+                "per_page": self.page_size,
+                "total": len(projects),
+            },
+        }
+
+    def handle_detail(self, body: Dict[str, Any], auth: Optional[str]) -> Tuple[int, Any]:
+        self.count("detail")
+        if not self.token_valid(auth):
+            self.count("status_401")
+            return 401, {"message": "Unauthenticated."}
+        if self.rate_429 > 0 and random.random() < self.rate_429:
+            self.count("status_429")
+            return 429, {"message": "Too Many Attempts."}
+        project_id = body.get("fk_project_id")
+        project_id = project_id if isinstance(project_id, int) else None
+        detail = self.catalogue.find(project_id, body.get("slug"))
+        if detail is not None and detail["id"] in self.invalid_ids:
+            self.count("status_422")
+            return 422, {"message": "The selected project is invalid."}
+        if detail is None or detail["id"] in self.missing_ids:
+            self.count("status_404")
+            return 404, {"message": "Project not found."}
+        return 200, {"status": True, "message": "Project Detail", "data": detail}
+
+    def handle_login(self, body: Dict[str, Any]) -> Tuple[int, Any]:
+        self.count("login")
+        if not body.get("username") or not body.get("password"):
+            return 422, {"message": "The username field is required."}
+        with self.lock:
+            failed = self.failed_logins > 0
+            self.failed_logins -= failed
+        if failed:
+            return 503, {"message": "Service unavailable."}
+        return 200, {"status": True, "data": {"token": self.issue_token()}}
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                if self.path == "/__stats":
+                    with server.lock:
+                        stats = dict(server.stats)
+                    stats["catalogue_size"] = len(server.catalogue.projects)
+                    self._send(200, stats, headers={})
+                else:
+                    self._send(404, {"message": "Not found."}, headers={})
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    body = {}
+                if not isinstance(body, dict):
+                    body = {}
+                auth = self.headers.get("Authorization")
+                headers: Dict[str, str] = {}
+                if self.path == "/__mutate":
+                    with server.lock:
+                        result = server.catalogue.mutate(
+                            int(body.get("add", 0)),
+                            int(body.get("update", 0)),
+                            int(body.get("remove", 0)),
+                        )
+                    self._send(200, result, headers)
+                    return
+                server.simulate_latency()
+                if self.path.endswith("/project/public/list"):
+                    status, payload = server.handle_list(body, auth)
+                elif self.path.endswith("/project/details"):
+                    status, payload = server.handle_detail(body, auth)
+                    if status == 429:
+                        headers["Retry-After"] = f"{server.retry_after:g}"
+                elif self.path.endswith("/login"):
+                    status, payload = server.handle_login(body)
+                else:
+                    status, payload = 404, {"message": "Not found."}
+                self._send(status, payload, headers)
+
+            def _send(self, status: int, payload: Any, headers: Dict[str, str]) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                    data = gzip.compress(data, compresslevel=5)
+                    headers["Content-Encoding"] = "gzip"
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+                server.count("bytes_sent", len(data))
+
+        return Handler
+
+
+def parse_ids(value: str) -> Set[int]:
+    return {int(part) for part in value.split(",") if part.strip()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixture", type=Path, default=DEFAULT_FIXTURE)
+    parser.add_argument("--catalogue-size", type=int, default=300)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of detail calls answered 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429")
+    parser.add_argument("--token-ttl", type=float, default=0.0, help="token lifetime in seconds (0 = forever)")
+    parser.add_argument("--missing-ids", type=parse_ids, default=set(), help="comma-separated ids answered 404")
+    parser.add_argument("--invalid-ids", type=parse_ids, default=set(), help="comma-separated ids answered 422")
+    parser.add_argument("--list-requires-auth", action="store_true")
+    parser.add_argument("--failed-logins", type=int, default=0, help="answer the first N logins with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockRemappServer(
+        port=args.port,
+        fixture=args.fixture,
+        catalogue_size=args.catalogue_size,
+        page_size=args.page_size,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        token_ttl=args.token_ttl,
+        missing_ids=args.missing_ids,
+        invalid_ids=args.invalid_ids,
+        failed_logins=args.failed_logins,
+        list_requires_auth=args.list_requires_auth,
+        seed=args.seed,
+    )
+    print(f"Mock Remapp API listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
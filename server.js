@@ -1,10 +1,14 @@
 const express = require('express');
 const fs = require('fs');
 const path = require('path');
+const http = require('http');
 const { exec } = require('child_process');
+const { openOffsetIndex } = require('./src/offsetIndex');
 
 const app = express();
 const API_KEY = process.env.API_KEY; // set in cPanel env vars
+// e.g. http://127.0.0.1:8787 when dist/refresh_worker.py is running
+const REFRESH_WORKER_URL = process.env.REFRESH_WORKER_URL || '';
 
 function requireApiKey(req, res, next) {
     if (!API_KEY) {
@@ -22,7 +26,9 @@ function requireApiKey(req, res, next) {
 }
 
 const listPath = path.join(__dirname, 'dist', 'projects_from_api.json');
-const detailsPath = path.join(__dirname, 'dist', 'projects_details_by_fk.json');
+const changesPath = path.join(__dirname, 'dist', 'projects_changes.jsonl');
+const metricsPath = path.join(__dirname, 'dist', 'run_metrics.json');
+const metricsPromPath = path.join(__dirname, 'dist', 'run_metrics.prom');
 const backupPath = path.join(__dirname, 'projects.json.bak');
 const cacheTtlMs = 24 * 60 * 60 * 1000;
 
@@ -38,6 +44,18 @@ function getFileStats(filePath) {
     };
 }
 
+function withOffsetIndex(fn) {
+    const index = openOffsetIndex(path.join(__dirname, 'dist'));
+    if (!index) {
+        return undefined;
+    }
+    try {
+        return fn(index);
+    } finally {
+        index.close();
+    }
+}
+
 function loadProjects() {
     try {
         const data = readJsonFile(listPath);
@@ -55,36 +73,66 @@ function loadProjects() {
 }
 
 app.get('/projects', requireApiKey, (req, res) => {
-    const result = loadProjects();
-
-    if (result.error) {
-        res.status(503).json({
-            error: 'Cached data unavailable',
-            details: 'dist/projects_from_api.json and projects.json.bak could not be read'
-        });
-        return;
-    }
-
     const page = Math.max(parseInt(req.query.page || '1', 10), 1);
     const perPage = Math.max(parseInt(req.query.per_page || '20', 10), 1);
-    const total = Array.isArray(result.data) ? result.data.length : 0;
     const start = (page - 1) * perPage;
     const end = start + perPage;
-    const pageData = Array.isArray(result.data) ? result.data.slice(start, end) : [];
 
-    const ageMs = Date.now() - result.stats.mtimeMs;
+    let result = withOffsetIndex((index) => ({
+        source: 'dist/projects_list.jsonl',
+        mtimeMs: index.counts.generatedAt * 1000,
+        total: index.counts.list,
+        pageData: index.page(start, end)
+    }));
+
+    if (!result) {
+        const loaded = loadProjects();
+        if (loaded.error) {
+            res.status(503).json({
+                error: 'Cached data unavailable',
+                details: 'dist/projects_from_api.json and projects.json.bak could not be read'
+            });
+            return;
+        }
+        result = {
+            source: loaded.source,
+            mtimeMs: loaded.stats.mtimeMs,
+            total: Array.isArray(loaded.data) ? loaded.data.length : 0,
+            pageData: Array.isArray(loaded.data) ? loaded.data.slice(start, end) : []
+        };
+    }
+
+    const ageMs = Date.now() - result.mtimeMs;
     const ageHours = Math.round((ageMs / (60 * 60 * 1000)) * 10) / 10;
 
     res.json({
         source: result.source,
-        lastUpdated: new Date(result.stats.mtimeMs).toISOString(),
+        lastUpdated: new Date(result.mtimeMs).toISOString(),
         ageHours,
         isStale: ageMs > cacheTtlMs,
-        count: total,
+        count: result.total,
         page,
         per_page: perPage,
-        total,
-        data: pageData
+        total: result.total,
+        data: result.pageData
+    });
+});
+
+app.get('/projects/stats', requireApiKey, (req, res) => {
+    const counts = withOffsetIndex((index) => index.counts);
+    if (!counts) {
+        res.status(503).json({
+            error: 'Index unavailable',
+            details: 'dist/projects_index.bin is missing or out of date'
+        });
+        return;
+    }
+    res.json({
+        total: counts.list,
+        withTitle: counts.titled,
+        withDetails: counts.details,
+        dataVersion: counts.dataVersion,
+        generatedAt: new Date(counts.generatedAt * 1000).toISOString()
     });
 });
 
@@ -97,46 +145,255 @@ app.get('/refresh/status', (req, res) => {
         // State file doesn't exist yet
     }
 
+    let metrics = null;
+    try {
+        metrics = readJsonFile(metricsPath);
+    } catch (error) {
+        // No run has written metrics yet
+    }
+
     res.json({
         refreshAvailable: !!API_KEY,
         hasState: !!state,
         lastRefresh: state ? state.last_fetch_timestamp : null,
         totalProjects: state ? state.total_projects : null,
+        lastRun: metrics ? {
+            status: metrics.status,
+            mode: metrics.mode,
+            startedAt: metrics.started_at,
+            updatedAt: metrics.updated_at,
+            durationSeconds: metrics.duration_seconds,
+            projectsPerSecond: metrics.projects_per_second,
+            phasesSeconds: metrics.phases_seconds,
+            counters: metrics.counters
+        } : null,
         message: API_KEY ? 'Refresh endpoint is available' : 'API_KEY not configured'
     });
 });
 
+app.get('/metrics', requireApiKey, (req, res) => {
+    try {
+        const text = fs.readFileSync(metricsPromPath, 'utf8');
+        res.type('text/plain; version=0.0.4').send(text);
+    } catch (error) {
+        res.status(503).json({
+            error: 'Metrics unavailable',
+            details: 'dist/run_metrics.prom could not be read'
+        });
+    }
+});
+
 app.get('/health', (req, res) => {
     res.json({ status: 'ok', time: new Date().toISOString() });
 });
 
 app.get('/projects/:id', requireApiKey, (req, res) => {
-    const id = Number(req.params.id);
-    if (!Number.isInteger(id)) {
-        res.status(400).json({ error: 'Invalid id' });
+    const param = req.params.id;
+    const id = Number(param);
+    const isId = /^\d+$/.test(param) && Number.isSafeInteger(id);
+
+    // Details are only served from the index: projects_details_by_fk.json is
+    // exported on request only, so it may be missing or out of date
+    const indexed = withOffsetIndex((index) => ({
+        detail: isId ? index.detailById(id) : index.detailBySlug(param)
+    }));
+    if (!indexed) {
+        res.status(503).json({
+            error: 'Index unavailable',
+            details: 'dist/projects_index.bin is missing or out of date'
+        });
+        return;
+    }
+    if (!indexed.detail) {
+        res.status(404).json({ error: 'Not found' });
         return;
     }
+    res.json(indexed.detail);
+});
+
+const CHANGES_CHUNK_BYTES = 64 * 1024;
 
+/**
+ * Reads dist/projects_changes.jsonl without scanning its whole history: the
+ * file is appended in seq order, so the first line after a cursor is found by
+ * binary search over byte offsets and only the lines after it are parsed.
+ */
+function readChangesSince(filePath, since, limit) {
+    const fd = fs.openSync(filePath, 'r');
     try {
-        const details = readJsonFile(detailsPath);
-        const detail = details && details[id];
-        if (!detail) {
-            res.status(404).json({ error: 'Not found' });
-            return;
+        const size = fs.fstatSync(fd).size;
+
+        // Offset of the first line starting at or after `position` (size if none)
+        const lineStartAtOrAfter = (position) => {
+            if (position <= 0) {
+                return 0;
+            }
+            let at = position - 1;
+            const chunk = Buffer.alloc(CHANGES_CHUNK_BYTES);
+            while (at < size) {
+                const read = fs.readSync(fd, chunk, 0, chunk.length, at);
+                const newline = chunk.subarray(0, read).indexOf(0x0a);
+                if (newline !== -1) {
+                    return at + newline + 1;
+                }
+                at += read;
+            }
+            return size;
+        };
+
+        const lineAt = (start) => {
+            const end = lineStartAtOrAfter(start + 1);
+            const buffer = Buffer.alloc(end - start);
+            fs.readSync(fd, buffer, 0, buffer.length, start);
+            return buffer.toString('utf8');
+        };
+
+        // An unreadable line (e.g. cut short by an interrupted append) takes the
+        // seq of the next readable one, which keeps the offsets ordered by seq
+        const seqAt = (start) => {
+            while (start < size) {
+                try {
+                    return JSON.parse(lineAt(start)).seq;
+                } catch (error) {
+                    start = lineStartAtOrAfter(start + 1);
+                }
+            }
+            return Infinity;
+        };
+
+        // Smallest line start whose seq is greater than `since`; lo is always a line start
+        let lo = 0;
+        let hi = size;
+        while (lo < hi) {
+            const mid = Math.floor((lo + hi) / 2);
+            const start = lineStartAtOrAfter(mid);
+            if (start >= hi) {
+                if (seqAt(lo) > since) {
+                    hi = lo;
+                } else {
+                    lo = lineStartAtOrAfter(lo + 1);
+                }
+            } else if (seqAt(start) > since) {
+                hi = start;
+            } else {
+                lo = lineStartAtOrAfter(start + 1);
+            }
         }
-        res.json(detail);
+
+        const data = [];
+        let hasMore = false;
+        let pending = '';
+        let position = lo;
+        const chunk = Buffer.alloc(CHANGES_CHUNK_BYTES);
+        while (position < size && !hasMore) {
+            const read = fs.readSync(fd, chunk, 0, chunk.length, position);
+            position += read;
+            const lines = (pending + chunk.toString('utf8', 0, read)).split('\n');
+            pending = position < size ? lines.pop() : '';
+            for (const line of lines) {
+                if (!line.trim()) {
+                    continue;
+                }
+                let entry;
+                try {
+                    entry = JSON.parse(line);
+                } catch (error) {
+                    continue;
+                }
+                if (entry.seq <= since) {
+                    continue;
+                }
+                if (data.length >= limit) {
+                    hasMore = true;
+                    break;
+                }
+                data.push(entry);
+            }
+        }
+        return { data, hasMore };
+    } finally {
+        fs.closeSync(fd);
+    }
+}
+
+app.get('/changes', requireApiKey, (req, res) => {
+    const since = Math.max(parseInt(req.query.since || '0', 10) || 0, 0);
+    const limit = Math.min(Math.max(parseInt(req.query.limit || '500', 10) || 500, 1), 5000);
+
+    let result;
+    try {
+        result = readChangesSince(changesPath, since, limit);
     } catch (error) {
-        res.status(503).json({
-            error: 'Details unavailable',
-            details: 'dist/projects_details_by_fk.json could not be read'
-        });
+        res.json({ since, cursor: since, hasMore: false, data: [] });
+        return;
     }
+
+    const { data, hasMore } = result;
+    res.json({
+        since,
+        cursor: data.length ? data[data.length - 1].seq : since,
+        hasMore,
+        data
+    });
 });
 
+function callRefreshWorker(method, route, body, callback) {
+    const url = new URL(route, REFRESH_WORKER_URL);
+    const data = body ? JSON.stringify(body) : '';
+    const req = http.request(url, {
+        method,
+        headers: { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(data) }
+    }, (workerRes) => {
+        let raw = '';
+        workerRes.setEncoding('utf8');
+        workerRes.on('data', (chunk) => { raw += chunk; });
+        workerRes.on('end', () => {
+            try {
+                callback(null, workerRes.statusCode, JSON.parse(raw));
+            } catch (error) {
+                callback(error);
+            }
+        });
+    });
+    req.on('error', (error) => callback(error));
+    req.end(data);
+}
+
+function refreshViaWorker(req, res, forceFullFetch) {
+    // Blocks until the job is done unless ?wait=false, matching the exec response
+    const wait = !(req.query.wait === 'false' || req.query.wait === '0');
+    const mode = forceFullFetch ? 'full' : 'incremental';
+    callRefreshWorker('POST', `/jobs${wait ? '?wait=1' : ''}`, { mode }, (error, status, job) => {
+        if (error) {
+            console.error(`Refresh worker error: ${error.message}`);
+            res.status(502).json({ error: 'Refresh worker unavailable', message: error.message });
+            return;
+        }
+        if (status >= 400 || job.status === 'failed' || job.status === 'cancelled') {
+            res.status(500).json({ error: 'Refresh failed', message: job.error, job });
+            return;
+        }
+        res.status(job.status === 'completed' ? 200 : 202).json({
+            success: job.status === 'completed',
+            mode: job.mode,
+            jobId: job.id,
+            status: job.status,
+            coalesced: job.coalesced,
+            progress: job.progress,
+            output: job.output
+        });
+    });
+}
+
 app.post('/refresh', requireApiKey, (req, res) => {
     const pythonScript = path.join(__dirname, 'dist', 'fetch_public_projects.py');
     const forceFullFetch = req.query.full === 'true' || req.query.full === '1';
 
+    if (REFRESH_WORKER_URL) {
+        refreshViaWorker(req, res, forceFullFetch);
+        return;
+    }
+
     const env = { ...process.env };
     if (forceFullFetch) {
         env.REMAPP_INCREMENTAL_MODE = '0';
@@ -166,6 +423,22 @@ app.post('/refresh', requireApiKey, (req, res) => {
     });
 });
 
+app.get('/refresh/jobs/:id', requireApiKey, (req, res) => {
+    if (!REFRESH_WORKER_URL) {
+        res.status(404).json({ error: 'Refresh worker not configured' });
+        return;
+    }
+    const id = parseInt(req.params.id, 10);
+    const wait = req.query.wait === 'true' || req.query.wait === '1';
+    callRefreshWorker('GET', `/jobs/${id}${wait ? '?wait=1' : ''}`, null, (error, status, job) => {
+        if (error) {
+            res.status(502).json({ error: 'Refresh worker unavailable', message: error.message });
+            return;
+        }
+        res.status(status).json(job);
+    });
+});
+
 const port = process.env.PORT || 3000;
 app.listen(port, () => {
     console.log(`API listening on port ${port}`);
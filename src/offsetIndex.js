@@ -0,0 +1,127 @@
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+
+// Layout of projects_index.bin, written by dist/offset_index.py
+const INDEX_FILENAME = 'projects_index.bin';
+const LIST_DATA_FILENAME = 'projects_list.jsonl';
+const DETAILS_DATA_FILENAME = 'projects_details_by_fk.jsonl';
+const INDEX_MAGIC = 'RMPIDX01';
+const INDEX_FORMAT_VERSION = 2;
+const INDEX_HEADER_SIZE = 76;
+const POSITION_ENTRY_SIZE = 12;
+const ID_ENTRY_SIZE = 20;
+const SLUG_ENTRY_SIZE = 20;
+
+function readBytes(fd, position, length) {
+  const buffer = Buffer.alloc(length);
+  fs.readSync(fd, buffer, 0, length, position);
+  return buffer;
+}
+
+/**
+ * Opens the offset index and its JSONL data files in `dir`, or returns null
+ * when they are missing or do not match it (e.g. right after a compaction).
+ * Every lookup reads a few fixed-width index entries and one record, so
+ * requests do not parse the whole catalogue. Call close() when done.
+ */
+function openOffsetIndex(dir) {
+  const fds = [];
+  const close = () => fds.forEach((fd) => fs.closeSync(fd));
+  try {
+    const indexFd = fs.openSync(path.join(dir, INDEX_FILENAME), 'r');
+    fds.push(indexFd);
+    const header = readBytes(indexFd, 0, INDEX_HEADER_SIZE);
+    if (header.toString('latin1', 0, 8) !== INDEX_MAGIC
+      || header.readUInt32LE(8) !== INDEX_FORMAT_VERSION) {
+      close();
+      return null;
+    }
+    const listFd = fs.openSync(path.join(dir, LIST_DATA_FILENAME), 'r');
+    fds.push(listFd);
+    const detailsFd = fs.openSync(path.join(dir, DETAILS_DATA_FILENAME), 'r');
+    fds.push(detailsFd);
+    // The data files only grow between compactions, so the files we opened
+    // match the index if they are the same inode and at least as long
+    const expected = [
+      [listFd, header.readBigUInt64LE(44), header.readBigUInt64LE(52)],
+      [detailsFd, header.readBigUInt64LE(60), header.readBigUInt64LE(68)]
+    ];
+    for (const [fd, ino, size] of expected) {
+      const stats = fs.fstatSync(fd, { bigint: true });
+      if (stats.ino !== ino || stats.size < size) {
+        close();
+        return null;
+      }
+    }
+
+    const counts = {
+      list: header.readUInt32LE(12),
+      details: header.readUInt32LE(16),
+      slugs: header.readUInt32LE(20),
+      titled: header.readUInt32LE(24),
+      dataVersion: Number(header.readBigInt64LE(28)),
+      generatedAt: header.readDoubleLE(36)
+    };
+    const positionsAt = INDEX_HEADER_SIZE;
+    const idsAt = positionsAt + counts.list * POSITION_ENTRY_SIZE;
+    const slugsAt = idsAt + counts.details * ID_ENTRY_SIZE;
+
+    const position = (index) => {
+      const entry = readBytes(indexFd, positionsAt + index * POSITION_ENTRY_SIZE, POSITION_ENTRY_SIZE);
+      return { offset: Number(entry.readBigUInt64LE(0)), length: entry.readUInt32LE(8) };
+    };
+
+    // Binary search over a table sorted by its leading 8-byte key
+    const search = (at, count, size, key, readKey) => {
+      let lo = 0;
+      let hi = count - 1;
+      while (lo <= hi) {
+        const mid = (lo + hi) >> 1;
+        const entry = readBytes(indexFd, at + mid * size, size);
+        const current = readKey(entry);
+        if (current === key) {
+          return { offset: Number(entry.readBigUInt64LE(8)), length: entry.readUInt32LE(16) };
+        }
+        if (current < key) {
+          lo = mid + 1;
+        } else {
+          hi = mid - 1;
+        }
+      }
+      return null;
+    };
+
+    const readDetail = (entry) => (
+      entry ? JSON.parse(readBytes(detailsFd, entry.offset, entry.length).toString('utf8')) : null
+    );
+
+    return {
+      counts,
+      page(start, end) {
+        const items = [];
+        for (let index = start; index < Math.min(end, counts.list); index++) {
+          const entry = position(index);
+          items.push(JSON.parse(readBytes(listFd, entry.offset, entry.length).toString('utf8')));
+        }
+        return items;
+      },
+      detailById(id) {
+        return readDetail(search(idsAt, counts.details, ID_ENTRY_SIZE, BigInt(id),
+          (entry) => entry.readBigInt64LE(0)));
+      },
+      detailBySlug(slug) {
+        const hash = crypto.createHash('sha1').update(slug, 'utf8').digest().readBigUInt64LE(0);
+        const detail = readDetail(search(slugsAt, counts.slugs, SLUG_ENTRY_SIZE, hash,
+          (entry) => entry.readBigUInt64LE(0)));
+        return detail && detail.slug === slug ? detail : null;
+      },
+      close
+    };
+  } catch (error) {
+    close();
+    return null;
+  }
+}
+
+module.exports = { openOffsetIndex };
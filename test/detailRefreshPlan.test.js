@@ -0,0 +1,120 @@
+const { runPythonJson } = require('./runPython');
+
+// Ten listed projects whose fetch history covers every branch of
+// ProjectStore.plan_detail_refresh (hours are counted back from NOW):
+//   1, 8  never fetched                      -> missing
+//   2     fetched 1h ago, list entry changed -> changed
+//   3     Completed, fetched 100h ago        -> fresh (Completed=720)
+//   4     Pre Sale, fetched 50h ago          -> stale (Pre Sale=48)
+//   5     Ready, fetched 30h ago             -> stale (default 24)
+//   6     fetch failed 10h ago               -> retried after 24h
+//   7     fetch failed 25h ago               -> stale
+//   9     Ready, fetched 2h ago              -> fresh
+//   10    Ready, fetched 72h ago             -> stale
+const RUN_PLANS = `
+import contextlib
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from project_store import ProjectStore
+
+NOW = 1_800_000_000.0
+STATUS = {2: "Ready", 3: "Completed", 4: "Pre Sale", 5: "Ready", 9: "Ready", 10: "Ready"}
+FETCHED_HOURS_AGO = {2: 1, 3: 100, 4: 50, 5: 30, 6: 10, 7: 25, 9: 2, 10: 72}
+MAX_AGE_BY_STATUS = {"Completed": 720, "Pre Sale": 48}
+
+
+def summarize(plan):
+    return {
+        "ids": [project_id for _, project_id in plan.jobs],
+        "missing": plan.missing,
+        "changed": plan.changed,
+        "stale": plan.stale,
+        "deferred": plan.deferred,
+        "summary": plan.summary(),
+    }
+
+
+with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sys.stderr):
+    store = ProjectStore(Path(tmp) / "projects.sqlite3")
+    projects = [{"id": i, "slug": f"project-{i}", "title": f"Project {i}"} for i in range(1, 11)]
+    store.sync_list(projects)
+    store.upsert_details(
+        {"fk_project_id": i, "slug": f"project-{i}", "project_status": status}
+        for i, status in STATUS.items()
+    )
+    for project_id in FETCHED_HOURS_AGO:
+        detail = store.get_detail(project_id)
+        store.record_fetch(str(project_id), detail or {"error": "Project not found (status 500)"})
+    with store.conn:
+        store.conn.executemany(
+            "UPDATE freshness SET fetched_at = ? WHERE key = ?",
+            [(NOW - hours * 3600, str(key)) for key, hours in FETCHED_HOURS_AGO.items()],
+        )
+    projects[1] = dict(projects[1], title="Project 2 (renamed)")
+    store.sync_list(projects)
+
+    plans = {
+        "default": store.plan_detail_refresh(
+            max_age_hours=24, max_age_by_status=MAX_AGE_BY_STATUS, now=NOW
+        ),
+        "budget_4": store.plan_detail_refresh(
+            budget=4, max_age_hours=24, max_age_by_status=MAX_AGE_BY_STATUS, now=NOW
+        ),
+        "budget_1": store.plan_detail_refresh(
+            budget=1, max_age_hours=24, max_age_by_status=MAX_AGE_BY_STATUS, now=NOW
+        ),
+        "never_stale": store.plan_detail_refresh(now=NOW),
+        "refresh_before": store.plan_detail_refresh(
+            max_age_hours=24,
+            max_age_by_status=MAX_AGE_BY_STATUS,
+            refresh_before=NOW - 5 * 3600,
+            now=NOW,
+        ),
+    }
+    store.close()
+print(json.dumps({name: summarize(plan) for name, plan in plans.items()}))
+`;
+
+describe('ProjectStore.plan_detail_refresh', () => {
+  let plans;
+
+  beforeAll(() => {
+    plans = runPythonJson(RUN_PLANS);
+  });
+
+  test('orders missing, then changed, then stale oldest first', () => {
+    expect(plans.default).toEqual({
+      ids: [1, 8, 2, 10, 4, 5, 7],
+      missing: 2,
+      changed: 1,
+      stale: 4,
+      deferred: 0,
+      summary: '2 missing, 1 changed in list, 4 stale; 0 deferred to later runs'
+    });
+  });
+
+  test('spends the budget in priority order and defers the rest', () => {
+    expect(plans.budget_4).toMatchObject({
+      ids: [1, 8, 2, 10], missing: 2, changed: 1, stale: 1, deferred: 3
+    });
+    expect(plans.budget_1).toMatchObject({
+      ids: [1], missing: 1, changed: 0, stale: 0, deferred: 6
+    });
+    expect(plans.budget_1.summary).toBe('1 missing, 0 changed in list, 0 stale; 6 deferred to later runs');
+  });
+
+  test('retries failed fetches after a day even when details never go stale', () => {
+    expect(plans.never_stale).toMatchObject({
+      ids: [1, 8, 2, 7], missing: 2, changed: 1, stale: 1, deferred: 0
+    });
+  });
+
+  test('refresh_before marks every earlier fetch stale regardless of max age', () => {
+    expect(plans.refresh_before).toMatchObject({
+      ids: [1, 8, 2, 3, 10, 4, 5, 7, 6], missing: 2, changed: 1, stale: 6, deferred: 0
+    });
+  });
+});
@@ -0,0 +1,141 @@
+const { runPythonJson } = require('./runPython');
+
+// Runs sync_project_list against scripts/mock_remapp_api.py (10 entries per
+// page, 60 projects) after each scenario changes the mock catalogue, and
+// reports what the sync returned next to what the mock now lists.
+const RUN_SCENARIOS = `
+import contextlib
+import json
+import sys
+
+import fetch_public_projects as scraper
+from mock_remapp_api import MockRemappServer
+
+
+def run(server, existing, incremental, on_page=None):
+    scraper.LIST_URL = f"{server.base_url}/api/project/public/list"
+    client = scraper.RemappClient()
+    if on_page is not None:
+        fetch_page = client.fetch_page
+
+        def fetch_and_notify(page):
+            payload = fetch_page(page)
+            on_page(page)
+            return payload
+
+        client.fetch_page = fetch_and_notify
+    try:
+        return scraper.sync_project_list(client, existing, incremental, workers=2)
+    finally:
+        client.close()
+
+
+def scenario(change=None, on_page=None):
+    server = MockRemappServer(catalogue_size=60, page_size=10, latency_ms=0, jitter_ms=0).start()
+    try:
+        existing = run(server, [], incremental=False).projects
+        if change is not None:
+            change(server.catalogue)
+        requests_before = server.stats["list"]
+        result = run(server, existing, incremental=True, on_page=on_page)
+        return {
+            "mode": result.mode,
+            "pages_fetched": result.pages_fetched,
+            "list_requests": server.stats["list"] - requests_before,
+            "added": result.added,
+            "updated": result.updated,
+            "removed": result.removed,
+            "ids": [project["id"] for project in result.projects],
+            "titles": {str(project["id"]): project["title"] for project in result.projects},
+            "existing_ids": [project["id"] for project in existing],
+            "server_ids": [detail["id"] for detail in server.catalogue.projects],
+        }
+    finally:
+        server.stop()
+
+
+def change_head(catalogue):
+    catalogue.projects[5]["title"] = "Renamed"
+    catalogue.mutate(add=3)
+
+
+def remove_last(catalogue):
+    catalogue.projects.pop()
+    catalogue.mutate()
+
+
+def shift_after_first_page(catalogue_holder):
+    def on_page(page):
+        # A project published between the first two requests pushes every
+        # entry down one place, so page 2 repeats the last entry of page 1
+        if page == 1:
+            catalogue_holder[0].mutate(add=1)
+    return on_page
+
+
+holder = []
+results = {}
+with contextlib.redirect_stdout(sys.stderr):
+    results["unchanged"] = scenario()
+    results["changed_head"] = scenario(change_head)
+    results["page_cap"] = scenario(lambda catalogue: catalogue.mutate(add=100))
+    results["removed"] = scenario(remove_last)
+    results["shifted"] = scenario(
+        lambda catalogue: (holder.append(catalogue), catalogue.mutate(add=15)),
+        on_page=shift_after_first_page(holder),
+    )
+print(json.dumps(results))
+`;
+
+describe('sync_project_list', () => {
+  let results;
+
+  beforeAll(() => {
+    results = runPythonJson(RUN_SCENARIOS);
+  });
+
+  test('stops after the first page when nothing changed', () => {
+    const result = results.unchanged;
+    expect(result.mode).toBe('incremental');
+    expect(result.list_requests).toBe(1);
+    expect(result.added).toEqual([]);
+    expect(result.updated).toEqual([]);
+    expect(result.ids).toEqual(result.existing_ids);
+  });
+
+  test('prepends new projects and replaces updated ones in place', () => {
+    const result = results.changed_head;
+    const renamedId = result.existing_ids[5];
+    expect(result.mode).toBe('incremental');
+    // Page 1 holds the new and the renamed projects, page 2 is unchanged
+    expect(result.pages_fetched).toBe(2);
+    expect(result.added).toEqual(result.server_ids.slice(0, 3));
+    expect(result.updated).toEqual([renamedId]);
+    expect(result.ids).toEqual([...result.server_ids.slice(0, 3), ...result.existing_ids]);
+    expect(result.titles[renamedId]).toBe('Renamed');
+  });
+
+  test('falls back to a full sync when the page cap is hit', () => {
+    const result = results.page_cap;
+    expect(result.mode).toBe('full');
+    expect(result.added).toHaveLength(100);
+    expect(result.ids).toEqual(result.server_ids);
+  });
+
+  test('falls back to a full sync when the total shows a removal', () => {
+    const result = results.removed;
+    const removedId = result.existing_ids[result.existing_ids.length - 1];
+    expect(result.mode).toBe('full');
+    expect(result.removed).toEqual([removedId]);
+    expect(result.ids).toEqual(result.existing_ids.slice(0, -1));
+  });
+
+  test('drops entries repeated when pages shift during the sync', () => {
+    const result = results.shifted;
+    expect(result.mode).toBe('incremental');
+    expect(new Set(result.ids).size).toBe(result.ids.length);
+    expect(result.added).toHaveLength(15);
+    // The project published mid-sync is left for the next run
+    expect(result.ids).toEqual(result.server_ids.slice(1));
+  });
+});
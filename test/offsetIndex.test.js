@@ -0,0 +1,98 @@
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { openOffsetIndex } = require('../src/offsetIndex');
+const { runPython } = require('./runPython');
+
+// Builds a small store in `dir` and writes the index with dist/offset_index.py,
+// so the test reads exactly what the scraper writes.
+const WRITE_INDEX = `
+import sys
+from pathlib import Path
+
+from project_store import ProjectStore
+
+out = Path(sys.argv[1])
+projects = [
+    {"id": i, "slug": f"project-{i}", "title": f"Project {i}" if i % 3 else ""}
+    for i in range(1, 26)
+]
+details = [
+    {"fk_project_id": i, "slug": f"project-{i}", "name": f"Project {i}", "units": i * 2}
+    for i in range(1, 26)
+    if i != 7
+]
+with ProjectStore(out / "projects.sqlite3") as store:
+    store.sync_list(projects)
+    store.upsert_details(details)
+    store.export_index(out)
+`;
+
+function writeIndex(dir) {
+  runPython(WRITE_INDEX, [dir]);
+}
+
+describe('openOffsetIndex', () => {
+  let dir;
+  let index;
+
+  beforeAll(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'offset-index-'));
+    writeIndex(dir);
+    index = openOffsetIndex(dir);
+  });
+
+  afterAll(() => {
+    if (index) {
+      index.close();
+    }
+    fs.rmSync(dir, { recursive: true, force: true });
+  });
+
+  test('reads the counts from the header', () => {
+    expect(index).not.toBeNull();
+    expect(index.counts).toMatchObject({ list: 25, details: 24, slugs: 24, titled: 17 });
+  });
+
+  test('page returns list entries in list order', () => {
+    const items = index.page(10, 20);
+    expect(items.map((item) => item.id)).toEqual([11, 12, 13, 14, 15, 16, 17, 18, 19, 20]);
+    expect(items[0]).toEqual({ id: 11, slug: 'project-11', title: 'Project 11' });
+    expect(index.page(20, 30).map((item) => item.id)).toEqual([21, 22, 23, 24, 25]);
+  });
+
+  test('detailById finds a detail by its fk id', () => {
+    expect(index.detailById(12)).toEqual({
+      fk_project_id: 12, slug: 'project-12', name: 'Project 12', units: 24
+    });
+    expect(index.detailById(7)).toBeNull();
+    expect(index.detailById(999)).toBeNull();
+  });
+
+  test('detailBySlug finds a detail by its slug', () => {
+    expect(index.detailBySlug('project-25')).toMatchObject({ fk_project_id: 25, units: 50 });
+    expect(index.detailBySlug('project-7')).toBeNull();
+    expect(index.detailBySlug('missing')).toBeNull();
+  });
+
+  test('the next export rebuilds an index whose data files were replaced', () => {
+    // A byte-identical copy, as left by copying dist/ or restoring a backup
+    for (const name of ['projects_list.jsonl', 'projects_details_by_fk.jsonl']) {
+      const dataPath = path.join(dir, name);
+      fs.copyFileSync(dataPath, `${dataPath}.copy`);
+      fs.renameSync(`${dataPath}.copy`, dataPath);
+    }
+    expect(openOffsetIndex(dir)).toBeNull();
+
+    // The store has not changed, so only the stale index can trigger this
+    writeIndex(dir);
+    const rebuilt = openOffsetIndex(dir);
+    expect(rebuilt).not.toBeNull();
+    try {
+      expect(rebuilt.page(0, 2).map((item) => item.id)).toEqual([1, 2]);
+      expect(rebuilt.detailBySlug('project-3')).toMatchObject({ fk_project_id: 3 });
+    } finally {
+      rebuilt.close();
+    }
+  });
+});
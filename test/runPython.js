@@ -0,0 +1,34 @@
+const path = require('path');
+const { spawnSync } = require('child_process');
+
+const ROOT_DIR = path.join(__dirname, '..');
+
+/**
+ * Runs a Python snippet with dist/ and scripts/ importable, the way the
+ * scraper and its tools import each other, and returns what it printed.
+ * Throws with the output when the snippet fails.
+ */
+function runPython(script, args = []) {
+  const result = spawnSync(process.env.PYTHON || 'python3', ['-c', script, ...args], {
+    encoding: 'utf8',
+    env: {
+      ...process.env,
+      PYTHONPATH: [path.join(ROOT_DIR, 'dist'), path.join(ROOT_DIR, 'scripts')].join(path.delimiter)
+    }
+  });
+  if (result.status !== 0) {
+    throw new Error(`Python exited with ${result.status}:\n${result.stdout}${result.stderr}`);
+  }
+  return result.stdout;
+}
+
+/**
+ * Runs a snippet that prints a JSON document as its last line (anything the
+ * scraper logs comes before it) and returns the parsed document.
+ */
+function runPythonJson(script, args = []) {
+  const lines = runPython(script, args).trim().split('\n');
+  return JSON.parse(lines[lines.length - 1]);
+}
+
+module.exports = { runPython, runPythonJson };
@@ -0,0 +1,80 @@
+const { runPythonJson } = require('./runPython');
+
+// Sends N detail requests at once with an expired token to
+// scripts/mock_remapp_api.py and counts the logins they trigger.
+const RUN_CONCURRENT_401S = `
+import contextlib
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import fetch_public_projects as scraper
+from mock_remapp_api import MockRemappServer
+
+WORKERS = 8
+
+
+def concurrent_401s(failed_logins):
+    server = MockRemappServer(catalogue_size=WORKERS, latency_ms=20, jitter_ms=0).start()
+    server.failed_logins = failed_logins
+    scraper.DETAIL_URL = f"{server.base_url}/api/project/details"
+    scraper.LOGIN_URL = f"{server.base_url}/api/login"
+    client = scraper.RemappClient("expired-token", "user", "secret", pool_size=WORKERS)
+    ready = threading.Barrier(WORKERS)
+    statuses = []
+
+    def fetch(project_id):
+        ready.wait()
+        response = client.post("detail", scraper.DETAIL_URL, {"fk_project_id": project_id})
+        statuses.append(response.status_code)
+
+    ids = [detail["id"] for detail in server.catalogue.projects]
+    threads = [threading.Thread(target=fetch, args=(project_id,)) for project_id in ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    client.close()
+    server.stop()
+    return {
+        "logins": server.stats["login"],
+        "refreshes": client.tokens.refresh_count,
+        "statuses": sorted(statuses),
+    }
+
+
+with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sys.stderr):
+    # A refreshed token is saved to .env; keep the repo's file out of it
+    scraper.ENV_PATH = Path(tmp) / ".env"
+    results = {
+        "healthy": concurrent_401s(failed_logins=0),
+        "first_login_fails": concurrent_401s(failed_logins=1),
+    }
+print(json.dumps(results))
+`;
+
+describe('TokenManager', () => {
+  let results;
+
+  beforeAll(() => {
+    results = runPythonJson(RUN_CONCURRENT_401S);
+  });
+
+  test('concurrent 401s share a single login', () => {
+    expect(results.healthy).toEqual({
+      logins: 1,
+      refreshes: 1,
+      statuses: Array(8).fill(200)
+    });
+  });
+
+  test('a failed login returns its caller the original 401 and the next caller logs in', () => {
+    expect(results.first_login_fails).toEqual({
+      logins: 2,
+      refreshes: 1,
+      statuses: [...Array(7).fill(200), 401]
+    });
+  });
+});